@@ -63,6 +63,8 @@ setup(
     # -*- Entry points: -*-
     [console_scripts]
     export_violareggiocalabria = parruc.violareggiocalabriamigration.scripts.export_news:main
+    benchmark_violareggiocalabria_extract = parruc.violareggiocalabriamigration.scripts.benchmark_extract:main
+    benchmark_violareggiocalabria_export = parruc.violareggiocalabriamigration.scripts.benchmark_export:main
     [z3c.autoinclude.plugin]
     target = plone
     """,
@@ -1,20 +1,92 @@
 # -*- coding: utf-8 -*-
+import json
+
+from zope.annotation.interfaces import IAnnotations
 from zope.interface import alsoProvides
 
 from collective.transmogrifier.transmogrifier import Transmogrifier
+from parruc.violareggiocalabriamigration.commit import get_cursor
+from parruc.violareggiocalabriamigration.commit import set_cursor
+from parruc.violareggiocalabriamigration.jobs import get_job
+from parruc.violareggiocalabriamigration.jobs import start_job
+from parruc.violareggiocalabriamigration.skipunchanged import STATS_KEY
 from plone.protect.interfaces import IDisableCSRFProtection
 from Products.Five.browser import BrowserView
 
 
+def json_response(request, data):
+    request.response.setHeader('Content-Type', 'application/json')
+    return json.dumps(data)
+
+
 class ImportViolaReggiocalabria(BrowserView):
+    """Starts the import in the background, a chunk of ``batch`` items
+    at a time, and returns its status (see @@violareggiocalabriaimport-
+    status). Imports from ``start`` if given, otherwise from where the
+    last import stopped; ``reset`` restarts from the first item.
+    With ``sync`` the import runs in the request, only on ``batch``
+    items if given
+    """
     pipeline = u'parruc.violareggiocalabriamigration.import'
 
+    def source_options(self):
+        options = {}
+        for name in ('start', 'batch'):
+            value = self.request.form.get(name)
+            if value is not None:
+                options[name] = str(int(value))
+        return options
+
     def __call__(self):
         alsoProvides(self.request, IDisableCSRFProtection)
         if not self.pipeline:
             return 'nessuna pipeline definita'
+        if not self.request.form.get('sync'):
+            return self.start_background()
+        if self.request.form.get('reset'):
+            set_cursor(self.context, 0)
         transmogrifier = Transmogrifier(self.context)
-        transmogrifier(self.pipeline)
+        transmogrifier(self.pipeline, source=self.source_options())
         res = ['Migrazione effettuata']
+        cursor = get_cursor(self.context)
+        if cursor:
+            res.append('Prossimo elemento: %d' % cursor)
+        stats = IAnnotations(transmogrifier).get(STATS_KEY)
+        if stats:
+            res.append('Nuovi: %(new)d, modificati: %(changed)d, '
+                       'invariati: %(unchanged)d' % stats)
 
         return '\n'.join(res)
+
+    def start_background(self):
+        options = self.source_options()
+        start = options.get('start')
+        if self.request.form.get('reset'):
+            start = 0
+        job = start_job(self.context, self.pipeline,
+                        batch=int(options.get('batch', 500)),
+                        start=None if start is None else int(start))
+        return json_response(self.request,
+                             job.status(get_cursor(self.context)))
+
+
+class ImportStatus(BrowserView):
+    """Status of the last background import as json"""
+
+    def __call__(self):
+        job = get_job(self.context)
+        if job is None:
+            return json_response(self.request, {"state": "none"})
+        return json_response(self.request,
+                             job.status(get_cursor(self.context)))
+
+
+class CancelImport(BrowserView):
+    """Stops the background import after the chunk it is importing"""
+
+    def __call__(self):
+        alsoProvides(self.request, IDisableCSRFProtection)
+        job = get_job(self.context)
+        if job is not None and job.state == "running":
+            job.cancel()
+        return ImportStatus(self.context, self.request)()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import os
+from ConfigParser import RawConfigParser
+
+from zope.component import getUtility
+from zope.interface import alsoProvides
+
+from collective.transmogrifier.transmogrifier import \
+    configuration_registry
+from collective.transmogrifier.utils import resolvePackageReferenceOrFile
+from parruc.violareggiocalabriamigration.redirects import resolve_redirects
+from parruc.violareggiocalabriamigration.scripts.redirectmap import MAP_NAME
+from parruc.violareggiocalabriamigration.scripts.redirectmap import \
+    read_redirect_map
+from plone.app.redirector.interfaces import IRedirectionStorage
+from plone.protect.interfaces import IDisableCSRFProtection
+from Products.Five.browser import BrowserView
+
+
+def source_directory(name):
+    """The ``directory`` of the source section of the registered
+    pipeline ``name``, following the configurations it includes like
+    the transmogrifier does (the including one wins)
+    """
+    parser = RawConfigParser()
+    parser.read(configuration_registry.getConfiguration(name)['configuration'])
+    directory = None
+    if parser.has_option('transmogrifier', 'include'):
+        for include in parser.get('transmogrifier', 'include').split():
+            directory = source_directory(include) or directory
+    if parser.has_option('source', 'directory'):
+        directory = parser.get('source', 'directory')
+    return directory
+
+
+class LoadRedirects(BrowserView):
+    """Adds the redirects of the redirect map written by the exporter,
+    the one given by ``path`` or the one in ``directory``, by default the
+    directory of the import source. Everything happens in the request
+    transaction
+    """
+    pipeline = u'parruc.violareggiocalabriamigration.import'
+
+    def map_path(self):
+        path = self.request.form.get('path')
+        if path:
+            return path
+        directory = self.request.form.get('directory') or \
+            source_directory(self.pipeline)
+        return os.path.join(resolvePackageReferenceOrFile(directory),
+                            MAP_NAME)
+
+    def __call__(self):
+        alsoProvides(self.request, IDisableCSRFProtection)
+        path = self.map_path()
+        if not os.path.exists(path):
+            return 'Mappa dei redirect %s non trovata' % path
+        redirects, cycles = resolve_redirects(read_redirect_map(path))
+        storage = getUtility(IRedirectionStorage)
+        root = '/'.join(self.context.getPhysicalPath())
+        added = existing = 0
+        for source, dest in sorted(redirects.items()):
+            source = (root + source).encode('utf-8')
+            dest = (root + dest).encode('utf-8')
+            if storage.get(source) == dest:
+                existing += 1
+                continue
+            storage.add(source, dest)
+            added += 1
+        return ('Redirect aggiunti: %d, gia presenti: %d, in un ciclo: %d'
+                % (added, existing, len(cycles)))
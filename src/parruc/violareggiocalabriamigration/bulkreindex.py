@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+import transaction
+from zope.interface import classProvides, implements
+
+from collective.transmogrifier.interfaces import ISection, ISectionBlueprint
+from collective.transmogrifier.utils import defaultMatcher
+from collective.transmogrifier.utils import traverse
+from Products.CMFCore.CMFCatalogAware import CMFCatalogAware
+
+logger = logging.getLogger("unibo.violareggiocalabriamigration.import")
+
+
+class BulkReindexSection(object):
+    """Like plone.app.transmogrifier.reindexobject, but the paths are
+    collected and reindexed once each just before the transaction that
+    changed them is committed (by the commit section) and at the end of
+    the pipeline, so the catalog is written once per object after every
+    other section changed it
+    """
+    classProvides(ISectionBlueprint)
+    implements(ISection)
+
+    def __init__(self, transmogrifier, name, options, previous):
+        self.previous = previous
+        self.context = transmogrifier.context
+        self.portal_catalog = transmogrifier.context.portal_catalog
+        self.pathkey = defaultMatcher(options, 'path-key', name, 'path')
+        self.indexes = [index for index
+                        in options.get('indexes', '').splitlines() if index]
+        self.pending = []
+        self.seen = set()
+
+    def flush(self):
+        start = time.time()
+        for path in self.pending:
+            obj = traverse(self.context, str(path).lstrip('/'), None)
+            if obj is None or not isinstance(obj, CMFCatalogAware):
+                continue
+            if self.indexes:
+                self.portal_catalog.reindexObject(obj, idxs=self.indexes)
+            else:
+                self.portal_catalog.reindexObject(obj)
+        if self.pending:
+            logger.info("Reindexed %d objects in %.1fs", len(self.pending),
+                        time.time() - start)
+        self.pending = []
+        self.seen = set()
+
+    def __iter__(self):
+        for item in self.previous:
+            pathkey = self.pathkey(*item.keys())[0]
+            if pathkey and item[pathkey] not in self.seen:
+                if not self.pending:
+                    # The batch goes in the same transaction as its objects
+                    transaction.get().addBeforeCommitHook(self.flush)
+                self.seen.add(item[pathkey])
+                self.pending.append(item[pathkey])
+            yield item
+        self.flush()
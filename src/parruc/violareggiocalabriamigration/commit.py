@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+import transaction
+from zope.annotation.interfaces import IAnnotations
+from zope.interface import classProvides, implements
+
+from collective.transmogrifier.interfaces import ISection, ISectionBlueprint
+
+logger = logging.getLogger("unibo.violareggiocalabriamigration.import")
+
+# Position in the export of the next item to import, in the site annotations
+CURSOR_KEY = "parruc.violareggiocalabriamigration.cursor"
+
+
+def get_cursor(context):
+    return IAnnotations(context).get(CURSOR_KEY, 0)
+
+
+def set_cursor(context, position):
+    annotations = IAnnotations(context)
+    if annotations.get(CURSOR_KEY, 0) != position:
+        annotations[CURSOR_KEY] = position
+
+
+class CommitSection(object):
+    """Commits the transaction every ``every`` items, ``seconds`` seconds
+    or ``megabytes`` MB of estimated data (the ``_size`` key set by the
+    source), whichever comes first (0 disables a threshold), then
+    minimizes the ZODB cache so that memory stays flat. Only the items
+    with a position (the ``_position`` key set by the source) count.
+    Every commit saves the cursor the source moved past the items it
+    read, so that an interrupted import restarts from the last commit.
+    With ``savepoint = true`` it makes savepoints instead, for the tests.
+    Goes at the end of the pipeline
+    """
+    classProvides(ISectionBlueprint)
+    implements(ISection)
+
+    def __init__(self, transmogrifier, name, options, previous):
+        self.previous = previous
+        self.context = transmogrifier.context
+        self.every = int(options.get('every', 100))
+        self.seconds = float(options.get('seconds', 60))
+        self.max_bytes = int(float(options.get('megabytes', 50)) * 2 ** 20)
+        self.savepoint = options.get('savepoint', 'false').lower() in (
+            '1', 'true', 'yes', 'on')
+        self.positionkey = options.get('position-key', '_position')
+        self.sizekey = options.get('size-key', '_size')
+
+    def commit(self, reason, items, size):
+        start = time.time()
+        if self.savepoint:
+            transaction.savepoint(optimistic=True)
+        else:
+            transaction.commit()
+        self.context._p_jar.cacheMinimize()
+        logger.info("Committed %d items (%d KB) by %s in %.2fs, next "
+                    "position %d", items, size // 1024, reason,
+                    time.time() - start, get_cursor(self.context))
+
+    def __iter__(self):
+        items = size = 0
+        started = time.time()
+        for item in self.previous:
+            yield item
+            if self.positionkey not in item:
+                continue
+            items += 1
+            size += item.get(self.sizekey, 0)
+            reason = None
+            if self.every and items >= self.every:
+                reason = "items"
+            elif self.max_bytes and size >= self.max_bytes:
+                reason = "size"
+            elif self.seconds and time.time() - started >= self.seconds:
+                reason = "time"
+            if reason:
+                self.commit(reason, items, size)
+                items = size = 0
+                started = time.time()
+        self.commit("end", items, size)
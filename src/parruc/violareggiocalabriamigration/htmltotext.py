@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import htmlentitydefs
+import re
+
+from zope.interface import classProvides, implements
+
+from collective.transmogrifier.interfaces import ISection, ISectionBlueprint
+
+# The regexes of the html_to_text transform of Products.PortalTransforms
+REGEXES = [
+    (re.compile('<script [^>]>.*</script>(?im)'), ' '),
+    (re.compile('<style [^>]>.*</style>(?im)'), ' '),
+    (re.compile('<head [^>]>.*</head>(?im)'), ' '),
+    (re.compile(r'(?im)</?(font|em|i|strong|b)(?=\W)[^>]*>'), ''),
+    (re.compile('<[^>]*>(?i)(?m)'), ' '),
+]
+ENTITY = re.compile(r'&([a-zA-Z0-9#]*?);')
+
+
+def replace_entity(match):
+    full, entity = match.group(), match.group(1)
+    codepoint = htmlentitydefs.name2codepoint.get(entity)
+    try:
+        if codepoint is None and entity.startswith('#x'):
+            codepoint = int(entity[2:], 16)
+        elif codepoint is None and entity.startswith('#'):
+            codepoint = int(entity[1:])
+        result = unichr(codepoint) if codepoint is not None else full
+    except ValueError:
+        # portal_transforms fails on these, we keep them
+        return full
+    if isinstance(full, unicode):
+        return result
+    return result.encode('utf-8')
+
+
+def html_to_text(value):
+    """What portal_transforms makes of value converting it from
+    text/html to text/plain, without the transforms machinery
+    """
+    for regex, replacement in REGEXES:
+        value = regex.sub(replacement, value)
+    return ENTITY.sub(replace_entity, value)
+
+
+class HtmlToTextSection(object):
+    """Converts the ``keys`` of the items from html to plain text, like
+    encode, plone.app.transmogrifier.portaltransforms and decode did.
+    Conversions are cached, as the same values come back often
+    """
+    classProvides(ISectionBlueprint)
+    implements(ISection)
+
+    def __init__(self, transmogrifier, name, options, previous):
+        self.previous = previous
+        self.keys = [key for key in options.get('keys', '').split() if key]
+        self.cache_size = int(options.get('cache-size', 10000))
+        self.cache = {}
+
+    def convert(self, value):
+        # u"a" == "a", but they convert to different types
+        key = (type(value), value)
+        if key not in self.cache:
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+            self.cache[key] = html_to_text(value)
+        return self.cache[key]
+
+    def __iter__(self):
+        for item in self.previous:
+            for key in self.keys:
+                if isinstance(item.get(key), basestring):
+                    item[key] = self.convert(item[key])
+            yield item
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+
+from zope.interface import classProvides, implements
+
+from collective.transmogrifier.interfaces import ISection, ISectionBlueprint
+from plone.namedfile.file import NamedBlobImage
+
+logger = logging.getLogger("unibo.violareggiocalabriamigration.import")
+
+
+class ImageSetterSection(object):
+    """Sets the image field of the object from the temporary file in the
+    ``_image`` key ({"file": path, "filename": name}). The file is moved
+    into the blob storage, so the image is never loaded in memory
+    """
+    classProvides(ISectionBlueprint)
+    implements(ISection)
+
+    def __init__(self, transmogrifier, name, options, previous):
+        self.previous = previous
+        self.context = transmogrifier.context
+        self.key = options.get('key', '_image')
+        self.pathkey = options.get('path-key', '_path')
+        self.field = options.get('field', 'image')
+
+    def __iter__(self):
+        for item in self.previous:
+            image = item.pop(self.key, None)
+            if not image or self.pathkey not in item:
+                yield item
+                continue
+            path = item[self.pathkey].encode("ascii").lstrip("/")
+            obj = self.context.unrestrictedTraverse(path, None)
+            if obj is None:
+                logger.warning("Cant set the image of missing '%s'", path)
+            else:
+                with open(image["file"], 'rb') as image_file:
+                    # plone.namedfile consumes the file when it can
+                    setattr(obj, self.field, NamedBlobImage(
+                        data=image_file,
+                        filename=unicode(image["filename"])))
+            if os.path.exists(image["file"]):
+                os.remove(image["file"])
+            yield item
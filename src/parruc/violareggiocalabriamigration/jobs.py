@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""The import running in a background thread, with its own ZODB
+connection, a chunk (a committed run of the pipeline on ``batch`` items)
+at a time, so that it can be followed and cancelled from other requests.
+"""
+import logging
+import threading
+import time
+import traceback
+
+import transaction
+from AccessControl.SecurityManagement import newSecurityManager
+from AccessControl.SecurityManagement import noSecurityManager
+from Testing.makerequest import makerequest
+from zope.annotation.interfaces import IAnnotations
+from zope.component.hooks import setSite
+
+from collective.transmogrifier.transmogrifier import Transmogrifier
+from parruc.violareggiocalabriamigration.commit import get_cursor
+from parruc.violareggiocalabriamigration.skipunchanged import STATS_KEY
+from parruc.violareggiocalabriamigration.source import END_KEY
+from parruc.violareggiocalabriamigration.source import START_INDEX_KEY
+from parruc.violareggiocalabriamigration.source import STOP_INDEX_KEY
+from parruc.violareggiocalabriamigration.source import TOTAL_KEY
+
+logger = logging.getLogger("unibo.violareggiocalabriamigration.import")
+
+# The jobs by site path, the last one of a site is kept until a new one
+JOBS = {}
+JOBS_LOCK = threading.Lock()
+
+
+class ImportJob(object):
+
+    def __init__(self, site, pipeline, batch=500, start=None):
+        self.db = site._p_jar.db()
+        self.site_path = site.getPhysicalPath()
+        self.user_id = site.portal_membership.getAuthenticatedMember().getId()
+        self.pipeline = pipeline
+        self.batch = batch
+        self.start = start
+        self.state = "running"
+        self.cancelled = False
+        self.started = time.time()
+        self.finished = None
+        self.position = start if start is not None else get_cursor(site)
+        # Indexes in the export of the first item and of the next one to
+        # import, known once the first chunk is done
+        self.first_index = self.index = None
+        self.total = None
+        self.chunks = 0
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0}
+        self.errors = []
+        self.thread = threading.Thread(target=self.run,
+                                       name="violareggiocalabriaimport")
+        self.thread.daemon = True
+
+    def cancel(self):
+        """The job stops after the chunk it is importing"""
+        self.cancelled = True
+
+    def status(self, position=None):
+        """The progress of the job, position is the cursor committed so
+        far (the job only knows it at the end of every chunk). The cursor
+        is an exporter count: the items done, their rate and the ETA are
+        counted from the index of the items in the export instead
+        """
+        if position is None or self.state != "running":
+            position = self.position
+        position = max(position, self.position)
+        done = 0
+        if self.index is not None:
+            done = self.index - self.first_index
+        elapsed = (self.finished or time.time()) - self.started
+        rate = done / elapsed if elapsed else 0.0
+        eta = None
+        if self.total is not None and rate:
+            eta = (self.total - self.index) / rate
+        return {"state": self.state,
+                "cancelled": self.cancelled,
+                "position": position,
+                "index": self.index,
+                "total": self.total,
+                "done": done,
+                "chunks": self.chunks,
+                "counts": self.counts,
+                "elapsed_seconds": elapsed,
+                "items_per_second": rate,
+                "eta_seconds": eta,
+                "errors": self.errors}
+
+    def run_chunk(self, site):
+        """Imports a chunk, returns whether it reached the end of the
+        export
+        """
+        transmogrifier = Transmogrifier(site)
+        options = {'batch': str(self.batch)}
+        if self.start is not None:
+            options['start'] = str(self.start)
+            self.start = None
+        transmogrifier(self.pipeline, source=options)
+        return self.chunk_done(IAnnotations(transmogrifier))
+
+    def chunk_done(self, annotations):
+        """Records what the source and skipunchanged sections left in the
+        transmogrifier annotations
+        """
+        for key, value in annotations.get(STATS_KEY, {}).items():
+            self.counts[key] += value
+        self.total = annotations.get(TOTAL_KEY, self.total)
+        if self.first_index is None:
+            self.first_index = annotations.get(START_INDEX_KEY)
+        self.index = annotations.get(STOP_INDEX_KEY, self.index)
+        self.chunks += 1
+        return annotations.get(END_KEY, False)
+
+    def import_chunks(self, site):
+        while not self.cancelled:
+            if self.run_chunk(site):
+                # The source reset the cursor
+                self.position = get_cursor(site)
+                self.state = "done"
+                return
+            cursor = get_cursor(site)
+            if cursor == self.position:
+                # The source moves the cursor past every item it reads
+                raise ValueError("The import is stuck at %d" % cursor)
+            self.position = cursor
+        self.state = "cancelled"
+
+    def open_site(self, connection):
+        app = makerequest(connection.root()['Application'])
+        site = app.unrestrictedTraverse(self.site_path)
+        setSite(site)
+        for acl_users in (site.acl_users, app.acl_users):
+            user = acl_users.getUserById(self.user_id)
+            if user is not None:
+                break
+        newSecurityManager(None, user.__of__(acl_users))
+        return site
+
+    def close_site(self):
+        noSecurityManager()
+        setSite(None)
+
+    def run(self):
+        connection = self.db.open()
+        try:
+            self.import_chunks(self.open_site(connection))
+        except Exception as e:
+            transaction.abort()
+            logger.exception("Import failed")
+            self.errors.append({"error": repr(e),
+                                "traceback": traceback.format_exc()})
+            self.state = "error"
+        finally:
+            self.finished = time.time()
+            self.close_site()
+            connection.close()
+        logger.info("Import %s: %d chunks, %s", self.state, self.chunks,
+                    self.counts)
+
+
+def get_job(site):
+    return JOBS.get(site.getPhysicalPath())
+
+
+def start_job(site, pipeline, batch=500, start=None):
+    """Starts the import of site, unless one is already running.
+    Returns the running job
+    """
+    with JOBS_LOCK:
+        job = get_job(site)
+        if job and job.state == "running":
+            return job
+        job = JOBS[site.getPhysicalPath()] = ImportJob(site, pipeline, batch,
+                                                       start)
+    job.thread.start()
+    return job
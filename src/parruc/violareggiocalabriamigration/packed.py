@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Packed export format: items are appended as json lines to shards of
+at most shard_size items, and index.json maps every item id to its
+(shard, offset, length) so that any item can be read with one seek.
+"""
+import json
+import logging
+import os
+
+
+logger = logging.getLogger("unibo.violareggiocalabriamigration.packed")
+
+INDEX_NAME = "index.json"
+SHARD_NAME = "items-%05d.jsonl"
+
+
+def is_packed(path):
+    return os.path.exists(os.path.join(path, INDEX_NAME))
+
+
+def shard_names(path):
+    return sorted(name for name in os.listdir(path)
+                  if name.startswith("items-") and name.endswith(".jsonl"))
+
+
+class PackedWriter(object):
+
+    def __init__(self, path, shard_size=1000, append=False, index_every=100):
+        self.path = path
+        self.shard_size = shard_size
+        self.index_every = index_every
+        self.index = {}
+        self.shard = 0
+        self.shard_items = 0
+        self.unsaved = 0
+        if not os.path.exists(path):
+            os.makedirs(path)
+        if append:
+            self.rebuild()
+        else:
+            for name in shard_names(path) + [INDEX_NAME]:
+                if os.path.exists(os.path.join(path, name)):
+                    os.remove(os.path.join(path, name))
+        self.file = self.open_shard()
+
+    def open_shard(self):
+        shard_file = open(os.path.join(self.path, SHARD_NAME % self.shard),
+                          "ab")
+        # tell() is only reliable in append mode after an explicit seek
+        shard_file.seek(0, os.SEEK_END)
+        return shard_file
+
+    def rebuild(self):
+        """Rebuilds the index from the shards, dropping any line left
+        half written by a killed export
+        """
+        for name in shard_names(self.path):
+            shard_path = os.path.join(self.path, name)
+            self.shard = int(name[len("items-"):-len(".jsonl")])
+            self.shard_items = 0
+            offset = 0
+            with open(shard_path, "rb") as shard_file:
+                for line in shard_file:
+                    if not line.endswith(b"\n"):
+                        logger.warning("Truncating %s at %d", name, offset)
+                        break
+                    item_id = json.loads(line)["id"]
+                    self.index[item_id] = [name, offset, len(line)]
+                    self.shard_items += 1
+                    offset += len(line)
+            if offset != os.path.getsize(shard_path):
+                with open(shard_path, "r+b") as shard_file:
+                    shard_file.truncate(offset)
+
+    def unique_id(self, item_id):
+        if item_id not in self.index:
+            return item_id
+        suffix = 1
+        while "%s-%d" % (item_id, suffix) in self.index:
+            suffix += 1
+        return "%s-%d" % (item_id, suffix)
+
+    def write(self, data, replace=False):
+        """Appends data. Unless replace is True an id already packed gets a
+        numeric suffix instead of hiding the previous item
+        """
+        if not replace:
+            data["id"] = self.unique_id(data["id"])
+        if self.shard_items >= self.shard_size:
+            self.file.close()
+            self.shard += 1
+            self.shard_items = 0
+            self.file = self.open_shard()
+        line = json.dumps(data) + "\n"
+        offset = self.file.tell()
+        self.file.write(line)
+        self.file.flush()
+        self.index[data["id"]] = [SHARD_NAME % self.shard, offset, len(line)]
+        self.shard_items += 1
+        self.unsaved += 1
+        if self.unsaved >= self.index_every:
+            self.save_index()
+        return data["id"]
+
+    def save_index(self):
+        """Writes the index to a temporary file renamed in place, so that
+        readers always see a complete one
+        """
+        index_path = os.path.join(self.path, INDEX_NAME)
+        with open(index_path + ".tmp", "w") as index_file:
+            json.dump(self.index, index_file)
+        os.rename(index_path + ".tmp", index_path)
+        self.unsaved = 0
+
+    def close(self):
+        self.file.close()
+        self.save_index()
+
+
+class PackedReader(object):
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_NAME)) as index_file:
+            self.index = json.load(index_file)
+        self.files = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, item_id):
+        return item_id in self.index
+
+    def ids(self):
+        return sorted(self.index)
+
+    def get(self, item_id):
+        shard, offset, length = self.index[item_id]
+        if shard not in self.files:
+            self.files[shard] = open(os.path.join(self.path, shard), "rb")
+        shard_file = self.files[shard]
+        shard_file.seek(offset)
+        return json.loads(shard_file.read(length))
+
+    def __iter__(self):
+        for item_id in self.ids():
+            yield self.get(item_id)
+
+    def close(self):
+        for shard_file in self.files.values():
+            shard_file.close()
+        self.files = {}
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import logging
+import time
 
+import transaction
 from zope.component import getUtility
 from zope.interface import classProvides, implements
 
@@ -16,7 +18,31 @@ except:
 logger = logging.getLogger('plone.app.transmogrifier.object_implementer')
 
 
+def resolve_redirects(redirects):
+    """Follows the chains of the source -> dest map to their final dest.
+    Returns the resolved map and the sources that end in a cycle (a
+    redirect to itself included), which are dropped
+    """
+    resolved = {}
+    cycles = set()
+    for source, dest in redirects.items():
+        chain = set([source])
+        while dest in redirects and dest not in chain:
+            chain.add(dest)
+            dest = redirects[dest]
+        if dest in chain:
+            cycles.add(source)
+        else:
+            resolved[source] = dest
+    return resolved, cycles
+
+
 class RedirectsSection(object):
+    """Adds a redirect from the source key to the dest key of the items.
+    Redirects are collected, deduplicated and resolved (see
+    resolve_redirects) and added to the storage just before every commit
+    and at the end of the pipeline
+    """
     classProvides(ISectionBlueprint)
     implements(ISection)
 
@@ -28,17 +54,57 @@ class RedirectsSection(object):
         self.condition = Condition(options.get('condition', 'python:True'),
                                    transmogrifier, name, options)
         self.storage = getUtility(IRedirectionStorage)
+        self.redirects = {}
+        self.pending = set()
+        self.stats = {"added": 0, "existing": 0, "duplicates": 0,
+                      "conflicts": 0, "cycles": 0}
+        self.seconds = 0.0
 
-    def __iter__(self):
+    def flush(self):
+        if not self.pending:
+            return
+        start = time.time()
+        resolved, cycles = resolve_redirects(self.redirects)
+        for source in sorted(self.pending):
+            if source in cycles:
+                logger.warning("Not adding redirect %s: it ends in a cycle",
+                               source)
+                self.stats["cycles"] += 1
+                continue
+            dest = resolved[source]
+            if self.storage.get(source) == dest:
+                self.stats["existing"] += 1
+                continue
+            self.storage.add(source, dest)
+            self.stats["added"] += 1
+        self.pending = set()
+        self.seconds += time.time() - start
 
+    def __iter__(self):
         for item in self.previous:
-            if not self.condition(item):
-                yield item
-            if self.destkey not in item or self.sourcekey not in item:
+            if not self.condition(item) or \
+                    self.destkey not in item or self.sourcekey not in item:
                 yield item
                 continue
             source = item[self.sourcekey]
             dest = item[self.destkey]
-            logger.warning("adding redirect %s to %s", source, dest)
-            self.storage.add(source, dest)
+            previous = self.redirects.get(source)
+            if previous is None:
+                if not self.pending:
+                    transaction.get().addBeforeCommitHook(self.flush)
+                self.redirects[source] = dest
+                self.pending.add(source)
+            elif previous == dest:
+                self.stats["duplicates"] += 1
+            else:
+                # The first item wins, like in the exporter
+                logger.warning("Redirect %s already goes to %s, not to %s",
+                               source, previous, dest)
+                self.stats["conflicts"] += 1
             yield item
+        self.flush()
+        self.stats["seconds"] = self.seconds
+        logger.info("Redirects: %(added)d added, %(existing)d existing, "
+                    "%(duplicates)d duplicates, %(conflicts)d conflicts, "
+                    "%(cycles)d in cycles, written in %(seconds).2fs",
+                    self.stats)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""End to end benchmark of the exporter: generates a synthetic dump,
+serves its pages from a local stand-in site with the given latency and
+runs an export for every size and number of workers, each one in its
+own process. Wall time, pages/sec and peak memory of every run are
+written to a json file.
+"""
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from parruc.violareggiocalabriamigration.scripts.standin import StandinServer
+from parruc.violareggiocalabriamigration.scripts.standin import write_dump
+
+usage = "usage: %(prog)s [options] [-- exporter options]"
+parser = argparse.ArgumentParser(usage=usage, description=__doc__)
+parser.add_argument(
+    "-s", "--sizes", type=str, dest="sizes", default="100,1000",
+    help="Comma separated rows of the dumps. Default is '100,1000'")
+parser.add_argument(
+    "-w", "--workers", type=str, dest="workers", default="1,4,16",
+    help="Comma separated workers of the exports. Default is '1,4,16'")
+parser.add_argument(
+    "--latency", type=float, dest="latency", default=0.05,
+    help="Seconds the stand-in site waits before every answer. "
+         "Default is 0.05")
+parser.add_argument(
+    "--image-size", type=int, dest="image_size", default=20,
+    help="Size in KB of the images of the stand-in site. Default is 20")
+parser.add_argument(
+    "-o", "--output", type=str, dest="output",
+    default="benchmark_export.json",
+    help="Results file. Default is 'benchmark_export.json'")
+parser.add_argument(
+    "--work-dir", type=str, dest="work_dir", default=None,
+    help="Where dumps and exports go, kept at the end. Default is a "
+         "temporary folder, removed at the end")
+parser.add_argument(
+    "exporter_args", nargs="*",
+    help="More options for the exporter, after --, e.g. -- --skip-images")
+
+
+def run_export(work_dir, base_url, size, workers, exporter_args):
+    """Exports the dump of size rows in a new process, returns its
+    results
+    """
+    export_path = os.path.join(work_dir, "export-%d-%d" % (size, workers))
+    stats_path = export_path + ".stats.json"
+    if os.path.exists(export_path):
+        shutil.rmtree(export_path)
+    args = [sys.executable, "-m",
+            "parruc.violareggiocalabriamigration.scripts.export_news",
+            "-p", export_path, "--input",
+            os.path.join(work_dir, "dump-%d" % size),
+            "--base-url", base_url, "-w", str(workers),
+            "--cache-size", "0", "--stats", stats_path] + exporter_args
+    # Buildout scripts set up sys.path themselves, the interpreter doesnt
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    start = time.time()
+    with open(export_path + ".log", "w") as log:
+        returncode = subprocess.call(args, stdout=log, stderr=log, env=env)
+    wall = time.time() - start
+    if returncode:
+        with open(export_path + ".log") as log:
+            return {"size": size, "workers": workers, "failed": returncode,
+                    "log": log.read()[-2000:]}
+    with open(stats_path) as stats_file:
+        stats = json.load(stats_file)
+    pages = stats["counters"].get("new", 0)
+    return {"size": size,
+            "workers": workers,
+            "wall_seconds": wall,
+            "pages": pages,
+            "pages_per_sec": pages / wall,
+            "peak_rss_kb": stats["peak_rss_kb"],
+            "peak_children_rss_kb": stats["peak_children_rss_kb"],
+            "http": stats["http"],
+            "stages": dict((stage, {"mean_ms": histogram["mean_ms"],
+                                    "p90_ms": histogram["p90_ms"]})
+                           for stage, histogram in stats["stages"].items())}
+
+
+def benchmark(work_dir, sizes, workers, latency, image_size, exporter_args):
+    server = StandinServer(latency=latency, articles=max(sizes),
+                           image_size=image_size * 1024).start()
+    results = []
+    try:
+        for size in sizes:
+            write_dump(os.path.join(work_dir, "dump-%d" % size),
+                       server.base_url, size)
+            for count in workers:
+                result = run_export(work_dir, server.base_url, size, count,
+                                    exporter_args)
+                results.append(result)
+                if "failed" in result:
+                    print("%6d rows %3d workers: failed\n%s" %
+                          (size, count, result["log"]))
+                    continue
+                print("%6d rows %3d workers: %8.1fs %8.1f pages/sec "
+                      "%8d KB peak RSS" % (
+                          size, count, result["wall_seconds"],
+                          result["pages_per_sec"], result["peak_rss_kb"]))
+    finally:
+        server.stop()
+    return results
+
+
+def main(*args, **kwargs):
+    if "-c" in sys.argv:
+        cmd_args = sys.argv[3:]
+    else:
+        cmd_args = sys.argv[1:]
+    options = parser.parse_args(cmd_args)
+    try:
+        sizes = [int(size) for size in options.sizes.split(",")]
+        workers = [int(count) for count in options.workers.split(",")]
+    except ValueError:
+        parser.error("--sizes and --workers must be comma separated numbers")
+    work_dir = options.work_dir or tempfile.mkdtemp(prefix="benchmark")
+    try:
+        results = benchmark(work_dir, sizes, workers, options.latency,
+                            options.image_size, options.exporter_args)
+    finally:
+        if not options.work_dir:
+            shutil.rmtree(work_dir)
+    with open(options.output, "w") as output:
+        json.dump({"latency": options.latency,
+                   "image_size_kb": options.image_size,
+                   "exporter_args": options.exporter_args,
+                   "results": results}, output, indent=2, sort_keys=True)
+    if any("failed" in result for result in results):
+        sys.exit(1)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Compares the article extractors on a corpus of saved pages (e.g. the
+.cache folder of an export): checks they give the same output as the
+BeautifulSoup one and reports how many pages/sec each one handles.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+from parruc.violareggiocalabriamigration.scripts.extract import EXTRACTORS
+from parruc.violareggiocalabriamigration.scripts.extract import extract_bs4
+
+usage = "usage: %(prog)s [options] corpus [corpus ...]"
+parser = argparse.ArgumentParser(usage=usage, description=__doc__)
+parser.add_argument(
+    "corpus", nargs="+",
+    help="Saved pages, or folders containing them")
+parser.add_argument(
+    "-n", "--repeat", type=int, dest="repeat", default=3,
+    help="Passes over the corpus for each extractor. Default is 3")
+
+
+def load_corpus(paths):
+    pages = []
+    for path in paths:
+        if os.path.isfile(path):
+            pages.append(path)
+            continue
+        for dir_path, dir_names, file_names in os.walk(path):
+            for file_name in sorted(file_names):
+                # Skip the metadata and temporary files of the cache
+                if file_name.endswith(".json") or file_name.endswith(".tmp"):
+                    continue
+                pages.append(os.path.join(dir_path, file_name))
+    corpus = []
+    for page in pages:
+        with open(page, "rb") as page_file:
+            corpus.append((page, page_file.read()))
+    return corpus
+
+
+def benchmark(corpus, repeat):
+    """Returns name -> (pages/sec, paths whose output differs from bs4)"""
+    reference = [extract_bs4(content) for path, content in corpus]
+    results = {}
+    for name, extract in sorted(EXTRACTORS.items()):
+        start = time.time()
+        for i in range(repeat):
+            extracted = [extract(content) for path, content in corpus]
+        elapsed = time.time() - start
+        mismatches = [path for (path, content), expected, found
+                      in zip(corpus, reference, extracted)
+                      if expected != found]
+        results[name] = (len(corpus) * repeat / elapsed, mismatches)
+    return results
+
+
+def main(*args, **kwargs):
+    if "-c" in sys.argv:
+        cmd_args = sys.argv[3:]
+    else:
+        cmd_args = sys.argv[1:]
+    options = parser.parse_args(cmd_args)
+    corpus = load_corpus(options.corpus)
+    if not corpus:
+        parser.error("No pages found")
+    results = benchmark(corpus, options.repeat)
+    for name, (pages_per_sec, mismatches) in sorted(results.items()):
+        print("%-5s %10.1f pages/sec %6d mismatches" %
+              (name, pages_per_sec, len(mismatches)))
+        for path in mismatches:
+            print("      differs: %s" % path)
+    if any(mismatches for pages_per_sec, mismatches in results.values()):
+        sys.exit(1)
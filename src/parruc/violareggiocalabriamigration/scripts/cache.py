@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("unibo.violareggiocalabriamigration.export")
+
+
+class CachedResponse(object):
+    """The subset of requests.Response the exporter uses"""
+
+    status_code = 200
+
+    def __init__(self, url, content, etag=None, last_modified=None):
+        self.url = url
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def raise_for_status(self):
+        pass
+
+
+class ResponseCache(object):
+    """On disk cache of the pages fetched by the exporter.
+    Every url has a body file and a json file with the final url and the
+    validators (ETag/Last-Modified) for conditional requests.
+    When the bodies exceed max_bytes the least recently used entries
+    are evicted; recency survives between runs through the files mtime
+    """
+
+    dir_name = ".cache"
+
+    def __init__(self, export_path, max_bytes):
+        self.path = os.path.join(export_path, self.dir_name)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        self.load()
+
+    def key(self, url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def body_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def load(self):
+        found = []
+        for dir_path, dir_names, file_names in os.walk(self.path):
+            for file_name in file_names:
+                if file_name.endswith(".json") or file_name.endswith(".tmp"):
+                    continue
+                stat = os.stat(os.path.join(dir_path, file_name))
+                found.append((stat.st_mtime, file_name, stat.st_size))
+        for mtime, key, size in sorted(found):
+            self.entries[key] = size
+            self.size += size
+        self.evict()
+
+    def get(self, url):
+        key = self.key(url)
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries[key] = self.entries.pop(key)
+        body_path = self.body_path(key)
+        try:
+            with open(body_path + ".json") as meta_file:
+                meta = json.load(meta_file)
+            with open(body_path, "rb") as body_file:
+                content = body_file.read()
+            os.utime(body_path, None)
+        except (IOError, OSError, ValueError):
+            logger.warning("Dropping corrupted cache entry for '%s'", url)
+            self.discard(key)
+            return None
+        return CachedResponse(meta["final_url"], content,
+                              meta.get("etag"), meta.get("last_modified"))
+
+    def put(self, url, req):
+        key = self.key(url)
+        body_path = self.body_path(key)
+        meta = {"url": url,
+                "final_url": req.url,
+                "etag": req.headers.get("ETag"),
+                "last_modified": req.headers.get("Last-Modified")}
+        if not os.path.exists(os.path.dirname(body_path)):
+            try:
+                os.makedirs(os.path.dirname(body_path))
+            except OSError:
+                # Another worker created it in the meantime
+                pass
+        # Body and metadata are renamed in place so that a killed export
+        # never leaves a half written entry
+        tmp_suffix = ".%s.tmp" % threading.current_thread().ident
+        with open(body_path + tmp_suffix, "wb") as body_file:
+            body_file.write(req.content)
+        with open(body_path + ".json" + tmp_suffix, "w") as meta_file:
+            json.dump(meta, meta_file)
+        os.rename(body_path + ".json" + tmp_suffix, body_path + ".json")
+        os.rename(body_path + tmp_suffix, body_path)
+        with self.lock:
+            self.size += len(req.content) - self.entries.pop(key, 0)
+            self.entries[key] = len(req.content)
+            self.evict()
+
+    def discard(self, key):
+        with self.lock:
+            self.size -= self.entries.pop(key, 0)
+        for path in (self.body_path(key), self.body_path(key) + ".json"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def evict(self):
+        """Must be called holding the lock (or before sharing the cache)"""
+        while self.size > self.max_bytes and self.entries:
+            key, size = self.entries.popitem(last=False)
+            self.size -= size
+            for path in (self.body_path(key), self.body_path(key) + ".json"):
+                if os.path.exists(path):
+                    os.remove(path)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import os
+from xml.etree.cElementTree import iterparse
+
+
+def local_name(tag):
+    """Strips the namespace from an ElementTree tag"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def dump_files(directory):
+    """The xml dumps in directory (subfolders are not considered)"""
+    for (dirpath, dirnames, filenames) in os.walk(directory):
+        for filename in sorted(filenames):
+            yield os.sep.join((dirpath, filename))
+
+        break
+
+
+def iter_contents(path):
+    """Streams the <content> elements of a Joomla dump one at a time.
+    Every element is freed and detached from its parent as soon as the
+    next one is requested, so memory stays flat whatever the dump size
+    """
+    parents = []
+    for event, elem in iterparse(path, events=("start", "end")):
+        if event == "start":
+            parents.append(elem)
+            continue
+        parents.pop()
+        if local_name(elem.tag) != "content":
+            continue
+        yield elem
+        elem.clear()
+        if parents:
+            parents[-1].remove(elem)
+
+
+def content_fields(elem):
+    """Maps the children of a <content> element to their text"""
+    return dict((local_name(child.tag), unicode("".join(child.itertext())))
+                for child in elem)
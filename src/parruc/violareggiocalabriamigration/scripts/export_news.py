@@ -2,26 +2,63 @@
 from __future__ import unicode_literals
 
 import argparse
+import cProfile
+import hashlib
+import itertools
 import json
 import logging
 import os
 import shutil
 import sys
+import time
+import urlparse
 from HTMLParser import HTMLParser
 
-import requests
 
-from bs4 import BeautifulSoup
+from parruc.violareggiocalabriamigration.packed import PackedWriter
+from parruc.violareggiocalabriamigration.scripts.cache import ResponseCache
+from parruc.violareggiocalabriamigration.scripts.dump import content_fields
+from parruc.violareggiocalabriamigration.scripts.dump import dump_files
+from parruc.violareggiocalabriamigration.scripts.dump import iter_contents
+from parruc.violareggiocalabriamigration.scripts.extract import \
+    DEFAULT_EXTRACTOR
+from parruc.violareggiocalabriamigration.scripts.extract import EXTRACTORS
+from parruc.violareggiocalabriamigration.scripts.fetcher import AdaptiveLimiter
+from parruc.violareggiocalabriamigration.scripts.fetcher import Fetcher
+from parruc.violareggiocalabriamigration.scripts.fetcher import get_session
+from parruc.violareggiocalabriamigration.scripts.frontier import Frontier
+from parruc.violareggiocalabriamigration.scripts.images import ImageStore
+from parruc.violareggiocalabriamigration.scripts.manifest import content_hash
+from parruc.violareggiocalabriamigration.scripts.manifest import Manifest
+from parruc.violareggiocalabriamigration.scripts.pipeline import close_pools
+from parruc.violareggiocalabriamigration.scripts.pipeline import make_pool
+from parruc.violareggiocalabriamigration.scripts.pipeline import ordered_map
+from parruc.violareggiocalabriamigration.scripts import merge
+from parruc.violareggiocalabriamigration.scripts.redirectmap import add_aliases
+from parruc.violareggiocalabriamigration.scripts.redirectmap import \
+    write_redirect_map
+from parruc.violareggiocalabriamigration.scripts.stats import Stats
+from parruc.violareggiocalabriamigration.scripts.visited import canonicalize
+from parruc.violareggiocalabriamigration.scripts.visited import VisitedIndex
 from plone.i18n.normalizer import idnormalizer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("unibo.violareggiocalabriamigration.export")
 
-usage = "usage: %(prog)s [options]"
+BASE_URL = "http://www.violareggiocalabria.it"
+
+usage = "usage: %(prog)s [options]\n       %(prog)s merge [options] shard ..."
 parser = argparse.ArgumentParser(usage=usage, description=__doc__)
 parser.add_argument(
     "-p", "--path", type=str, dest="export_path", default="exported",
     help="Results export folder. Default is 'exported'")
+parser.add_argument(
+    "--input", type=str, dest="input_path", default="to_import",
+    help="Folder with the xml dumps of the Joomla content table. "
+         "Default is 'to_import'")
+parser.add_argument(
+    "--base-url", type=str, dest="base_url", default=None,
+    help="Url of the site to export. Default is '%s'" % BASE_URL)
 parser.add_argument(
     "-l", "--limit", type=int, dest="limit", default=0,
     help="Limit the number of pages to import (for debugging purpose)")
@@ -32,15 +69,128 @@ parser.add_argument(
     "-f", "--force",
     action="store_true", dest="force", default=False,
     help="Dont trust current structure, and overwrite it (slower)")
+parser.add_argument(
+    "-w", "--workers", type=int, dest="workers", default=1,
+    help="Number of pages fetched concurrently. Default is 1")
+parser.add_argument(
+    "--parse-workers", type=int, dest="parse_workers", default=0,
+    help="Number of processes extracting the articles. Default is 0, "
+         "extract them in the fetching threads")
+parser.add_argument(
+    "--image-workers", type=int, dest="image_workers", default=0,
+    help="Number of threads downloading the images of the pages. "
+         "Default is 0, download them in the fetching threads")
+parser.add_argument(
+    "--queue-size", type=int, dest="queue_size", default=0,
+    help="Pages waiting in each stage of the export, unless set for the "
+         "stage. Default is twice the workers of the stage")
+parser.add_argument(
+    "--fetch-queue", type=int, dest="fetch_queue", default=0,
+    help="Pages waiting to be fetched. Default is --queue-size")
+parser.add_argument(
+    "--parse-queue", type=int, dest="parse_queue", default=0,
+    help="Pages waiting to be extracted. Default is --queue-size")
+parser.add_argument(
+    "--image-queue", type=int, dest="image_queue", default=0,
+    help="Pages waiting for their images. Default is --queue-size")
+parser.add_argument(
+    "-r", "--resume",
+    action="store_true", dest="resume", default=False,
+    help="Continue an interrupted export skipping the pages it already saved")
+parser.add_argument(
+    "--cache-size", type=int, dest="cache_size", default=1024,
+    help="Size in MB of the pages cache kept in the export folder, "
+         "0 disables it. Default is 1024")
+parser.add_argument(
+    "--cache-only",
+    action="store_true", dest="cache_only", default=False,
+    help="Dont hit the network, export only the pages already cached")
+parser.add_argument(
+    "--parser", choices=sorted(EXTRACTORS), dest="extractor",
+    default=DEFAULT_EXTRACTOR,
+    help="Backend used to extract the articles. Default is '%s'" %
+         DEFAULT_EXTRACTOR)
+parser.add_argument(
+    "--format", choices=["files", "packed"], dest="output_format",
+    default="files",
+    help="Save a json file per page, or pack them in json lines shards "
+         "with an index. Default is 'files'")
+parser.add_argument(
+    "--shard-size", type=int, dest="shard_size", default=1000,
+    help="Pages per shard of the packed format. Default is 1000")
+parser.add_argument(
+    "-i", "--incremental",
+    action="store_true", dest="incremental", default=False,
+    help="Only fetch the rows modified since the last export")
+parser.add_argument(
+    "--skip-images",
+    action="store_true", dest="skip_images", default=False,
+    help="Dont download the images of the pages, only record their urls")
+parser.add_argument(
+    "--timeout", type=float, dest="timeout", default=30,
+    help="Seconds to wait for each answer of the site. Default is 30")
+parser.add_argument(
+    "--retries", type=int, dest="retries", default=3,
+    help="Retries for timeouts, connection errors and 5xx answers. "
+         "Default is 3")
+parser.add_argument(
+    "--latency-target", type=float, dest="latency_target", default=2.0,
+    help="Answers slower than this (in seconds) reduce the concurrency. "
+         "Default is 2")
+parser.add_argument(
+    "--shard", type=str, dest="shard", default=None,
+    help="Export only the i-th of N shards of the rows, as 'i/N'. The "
+         "shards can be exported independently and joined with 'merge'")
+parser.add_argument(
+    "--crawl",
+    action="store_true", dest="crawl", default=False,
+    help="After the dump, follow the links found in the articles to "
+         "export the pages the dump doesnt list")
+parser.add_argument(
+    "--max-depth", type=int, dest="max_depth", default=3,
+    help="Links followed from a page of the dump to reach a crawled page. "
+         "Default is 3")
+parser.add_argument(
+    "--max-pages", type=int, dest="max_pages", default=0,
+    help="Stop the crawl after fetching this many pages. Default is 0, "
+         "no limit")
+parser.add_argument(
+    "--crawl-workers", type=int, dest="crawl_workers", default=2,
+    help="Pages fetched concurrently while crawling, capped by the "
+         "workers. Default is 2")
+parser.add_argument(
+    "--crawl-delay", type=float, dest="crawl_delay", default=0.5,
+    help="Seconds each worker waits before fetching a crawled page. "
+         "Default is 0.5")
+parser.add_argument(
+    "--stats", type=str, dest="stats_path", default=None,
+    help="Write counters, per stage latencies and memory usage to this "
+         "json file")
+parser.add_argument(
+    "--profile", type=str, dest="profile", default=None,
+    help="Dump the cProfile stats of the main thread to this file")
 
 
 reject_links = ["#"]
+skip_extensions = (".jpg", ".jpeg", ".png", ".gif", ".pdf", ".doc", ".docx",
+                   ".xls", ".xlsx", ".zip", ".rar", ".mp3", ".mp4")
 
-VISITED_PAGES = []
+VISITED_PAGES = None
 TAKEN_PATHS = []
 REDIRECTS = {}
-BASE_URL = "http://www.violareggiocalabria.it"
 COUNTER = 0
+FETCHER = None
+CACHE = None
+CACHE_ONLY = False
+EXTRACT = EXTRACTORS[DEFAULT_EXTRACTOR]
+WRITER = None
+MANIFEST = None
+IMAGES = None
+SHARDED = False
+FRONTIER = None
+MAX_DEPTH = 0
+CRAWL_DELAY = 0
+STATS = Stats()
 normalize = idnormalizer.normalize
 
 
@@ -54,97 +204,498 @@ def get_absolute_link(link):
     return link
 
 
-def save_json(export_path, data):
+def save_json(export_path, data, count=None):
+    """Saves data as a new page, or replacing the page saved with count.
+    Returns the file name, None for the packed format
+    """
     global COUNTER
     if not data:
         return
-    data["count"] = COUNTER
-    file_name = normalize(data["title"].strip()) + ".json"
-    path = os.sep.join((export_path, file_name))
-    with open(path, 'w') as f:
-        json.dump(data, f)
-    COUNTER += 1
+    data["count"] = COUNTER if count is None else count
+    file_name = None
+    if WRITER:
+        with STATS.timer("write"):
+            WRITER.write(data, replace=count is not None)
+    else:
+        with STATS.timer("normalize"):
+            file_name = normalize(data["title"].strip()) + ".json"
+        path = os.sep.join((export_path, file_name))
+        with STATS.timer("write"):
+            with open(path, 'w') as f:
+                json.dump(data, f)
+    if count is None:
+        COUNTER += 1
+    return file_name
+
+
+def fetch(url):
+    """Gets url through the response cache, revalidating cached pages
+    with a conditional request unless we are working offline
+    """
+    cached = CACHE.get(url) if CACHE else None
+    if CACHE_ONLY:
+        if cached:
+            STATS.incr("cached")
+        return cached
+    headers = {}
+    if cached and cached.etag:
+        headers["If-None-Match"] = cached.etag
+    if cached and cached.last_modified:
+        headers["If-Modified-Since"] = cached.last_modified
+    with STATS.timer("fetch"):
+        req = FETCHER.get(url, headers=headers)
+    if req.status_code == 304 and cached:
+        STATS.incr("cached")
+        return cached
+    req.raise_for_status()
+    STATS.incr("fetched")
+    if CACHE:
+        CACHE.put(url, req)
+    return req
 
 
 def get_url_checking(url):
+    """Fetches url. Safe to be called from the worker threads:
+    the visited pages are only read here, claim_pages updates them
+    """
     url = get_absolute_link(url)
     if not url:
         logger.warning("Found an empty link to '%s'", url)
+        STATS.incr("empty")
         return None
     if url in VISITED_PAGES:
         logger.info("Link '%s' already visited", url)
+        STATS.incr("visited")
         return None
     try:
-        req = requests.get(url)
-        req.raise_for_status()
+        req = fetch(url)
     except:
         logger.warning("Found a broken link to '%s'", url)
+        STATS.incr("broken")
         return None
-    if req.url in VISITED_PAGES:
-        logger.warning("Link redirected to already visited page '%s'", req.url)
+    if not req:
+        logger.warning("Link '%s' is not cached", url)
+        STATS.incr("not_cached")
         return None
+    if req.url != url:
+        STATS.incr("redirected")
     if not req.url.startswith(BASE_URL):
         logger.info("Link '%s' points outside", req.url)
+        STATS.incr("outside")
         return None
-    VISITED_PAGES.append(req.url)
     return req
 
 
-def prepare_dict(url):
-    req = get_url_checking(url)
+def is_new_page(url, final_url):
+    if get_absolute_link(url) in VISITED_PAGES:
+        logger.info("Link '%s' already visited", url)
+        STATS.incr("visited")
+        return False
+    if final_url in VISITED_PAGES:
+        logger.warning("Link redirected to already visited page '%s'",
+                       final_url)
+        STATS.incr("visited")
+        REDIRECTS[get_absolute_link(url)] = final_url
+        return False
+    return True
+
+
+def prepare_dict(url, content):
+    extracted = EXTRACT(content)
+    if not extracted:
+        logger.warning("No article found in '%s'", url)
+        return None
+    for image in extracted["images"]:
+        image["src"] = get_absolute_link(image["src"])
+    return {"images": extracted["images"], "text": extracted["text"],
+            "url": url, "links": extracted["links"],
+            "page_title": extracted["title"]}
+
+
+def store_images(res):
+    """Downloads the page images in the image store and records their
+    blob, so that the import doesnt need the network
+    """
+    for image in res["images"]:
+        with STATS.timer("images"):
+            entry = IMAGES.get(image["src"])
+        if entry:
+            image["blob"] = entry["blob"]
+
+
+def read_row(row):
+    """Returns the fields we need from a <content> row of the dump"""
+    url = row["url"].replace("/administrator", "")
+    html_parser = HTMLParser()
+    url = html_parser.unescape(html_parser.unescape(url))
+    pub_date = row["publish_up"]
+    mod_date = row["modified"]
+    if mod_date == "0000-00-00 00:00:00":
+        mod_date = pub_date
+    return {"title": row["title"],
+            "url": url,
+            "category": row["catid"],
+            "pub_date": pub_date,
+            "mod_date": mod_date,
+            "featured": bool(int(row["featured"])),
+            "hits": row["hits"]}
+
+
+def parse_shard(shard):
+    """'i/N' -> (i, N)"""
+    try:
+        index, total = [int(part) for part in shard.split("/")]
+    except ValueError:
+        parser.error("--shard must be like 0/4")
+    if not 0 <= index < total:
+        parser.error("--shard index must be between 0 and N-1")
+    return index, total
+
+
+def in_shard(url, shard):
+    """Rows are assigned to shards by a stable hash of their canonical url,
+    so that rows pointing to the same page always end in the same shard
+    """
+    index, total = shard
+    key = canonicalize(get_absolute_link(url)).encode("utf-8")
+    return int(hashlib.md5(key).hexdigest(), 16) % total == index
+
+
+def iter_rows(input_path, offset, limit, shard=None):
+    """Streams the rows of all the dumps. Rows before offset are skipped
+    by the xml parser without being turned into dicts. Every row knows
+    its position in the dumps, used to merge the shards
+    """
+    contents = itertools.chain.from_iterable(
+        iter_contents(path) for path in dump_files(input_path))
+    stop = offset + limit if limit else None
+    contents = itertools.islice(contents, offset, stop)
+    for position in itertools.count(offset):
+        start = time.time()
+        elem = next(contents, None)
+        if elem is None:
+            return
+        row = read_row(content_fields(elem))
+        row["position"] = position
+        STATS.record("xml", time.time() - start)
+        if shard and not in_shard(row["url"], shard):
+            continue
+        yield row
+
+
+def check_unchanged(rows):
+    for row in rows:
+        row["unchanged"] = MANIFEST.unchanged(row["url"], row["mod_date"])
+        yield row
+
+
+def fetch_row(row):
+    """Fetch stage, runs in the worker threads"""
+    if row.get("unchanged"):
+        return row, None, None
+    if row.get("crawled") and CRAWL_DELAY:
+        time.sleep(CRAWL_DELAY)
+    req = get_url_checking(row["url"])
     if not req:
+        return row, None, None
+    return row, req.url, req.content
+
+
+def claim_pages(pages):
+    """Runs in the main thread and in rows order, so that the first row
+    pointing to a page always wins no matter which worker fetched it
+    first. Duplicated pages are dropped here, before being parsed
+    """
+    for row, url, content in pages:
+        previous = row.get("unchanged")
+        if previous:
+            link = get_absolute_link(row["url"])
+            if link not in VISITED_PAGES:
+                VISITED_PAGES.reserve(link, previous["final_url"])
+                yield row, url, content
+            continue
+        link = get_absolute_link(row["url"])
+        if content is None and link in VISITED_PAGES:
+            # Saved by the export we are resuming, or by a previous row:
+            # get_url_checking already logged it
+            continue
+        if content is None or not is_new_page(row["url"], url):
+            logger.warning("error for url %s" % row["url"])
+            continue
+        VISITED_PAGES.reserve(link, url)
+        yield row, url, content
+
+
+def extract_row(page):
+    """Extraction stage, runs in the worker processes (or threads).
+    Also returns the time spent parsing, as the stats of the worker
+    processes are lost
+    """
+    row, url, content = page
+    if content is None:
+        return row, url, None, None
+    start = time.time()
+    res = prepare_dict(url, content)
+    return row, url, res, time.time() - start
+
+
+def record_parse_times(pages):
+    for row, url, res, seconds in pages:
+        if seconds is not None:
+            STATS.record("parse", seconds)
+            if not res:
+                STATS.incr("no_article")
+        yield row, url, res
+
+
+def store_row_images(page):
+    """Images stage, runs in the worker threads"""
+    row, url, res = page
+    if res:
+        store_images(res)
+    return page
+
+
+def is_saved(export_path, entry):
+    """Whether the page of a manifest entry is still in the export"""
+    if WRITER:
+        return entry["id"] in WRITER.index
+    return os.path.exists(os.sep.join((export_path, entry["file"])))
+
+
+def save_page(export_path, row, final_url, res):
+    """Serialization stage, runs in the main thread in rows order"""
+    url = get_absolute_link(row["url"])
+    previous = row.get("unchanged")
+    if previous:
+        VISITED_PAGES.add(previous["count"], url, previous["final_url"])
+        STATS.incr("skipped")
         return
-    parser = BeautifulSoup(req.content, 'html.parser')
-    article = parser.select("div.item-page")[0]
-    images = []
-    for image in article.select("img"):
-        src = ""
-        alt = ""
-        if image and "alt" in image.attrs:
-            alt = image.get("alt")
-        if image and "src" in image.attrs:
-            src = get_absolute_link(image.get("src"))
-            images.append({"alt": alt, "src": src})
-    text = ""
-    for paragraph in article.select("p"):
-        paragraph_text = paragraph.get_text().strip()
-        if paragraph_text:
-            text += "<p>" + paragraph_text + "</p>"
-    return {"images": images, "text": text, "url": req.url}
-
-
-def export_news(offset, limit, force, export_path):
-    for (dirpath, dirnames, filenames) in os.walk("to_import"):
-        for filename in filenames:
-            with open(os.sep.join((dirpath, filename))) as opened_file:
-                parser = BeautifulSoup(opened_file, 'xml')
-                if not os.path.exists(export_path):
-                    os.makedirs(export_path)
-                rows = parser.find_all("content")
-                for row in rows:
-                    title = row.find("title").text
-                    url = row.find("url").text.replace("/administrator", "")
-                    html_parser = HTMLParser()
-                    url = html_parser.unescape(html_parser.unescape(url))
-                    pub_date = row.find("publish_up").text
-                    mod_date = row.find("modified").text
-                    featured = bool(int(row.find("featured").text))
-                    if mod_date == "0000-00-00 00:00:00":
-                        mod_date = pub_date
-                    res = prepare_dict(url)
-                    if not res:
-                        logger.warning("error for url %s" % url)
-                        continue
-                    res["title"] = title
-                    res["id"] = normalize(title, max_length=200)
-                    res["category"] = row.find("catid").text
-                    res["pub_date"] = pub_date
-                    res["mod_date"] = mod_date
-                    res["featured"] = featured
-                    res["hits"] = row.find("hits").text
-                    save_json(export_path, res)
-
-        break
+    if not res:
+        logger.warning("error for url %s" % row["url"])
+        return
+    links = res.pop("links")
+    page_title = res.pop("page_title")
+    if FRONTIER:
+        FRONTIER.mark_seen(canonicalize(url))
+        FRONTIER.mark_seen(canonicalize(final_url))
+        depth = row.get("depth", 0)
+        if depth < MAX_DEPTH:
+            queue_links(final_url, links, depth + 1)
+    if row.get("crawled"):
+        # The dump knows nothing about crawled pages
+        row["title"] = page_title or \
+            urlparse.urlsplit(final_url).path.rstrip("/").split("/")[-1]
+    res["title"] = row["title"]
+    with STATS.timer("normalize"):
+        res["id"] = normalize(row["title"], max_length=200)
+    res["category"] = row["category"]
+    res["pub_date"] = row["pub_date"]
+    res["mod_date"] = row["mod_date"]
+    res["featured"] = row["featured"]
+    res["hits"] = row["hits"]
+    if SHARDED:
+        res["position"] = row["position"]
+    digest = content_hash(res)
+    previous = MANIFEST.get(row["url"])
+    if previous and previous["hash"] == digest and \
+            is_saved(export_path, previous):
+        STATS.incr("unchanged")
+    elif previous:
+        if WRITER:
+            res["id"] = previous["id"]
+        file_name = save_json(export_path, res, previous["count"])
+        if previous["file"] and previous["file"] != file_name:
+            old_file = os.sep.join((export_path, previous["file"]))
+            if os.path.exists(old_file):
+                os.remove(old_file)
+        previous["file"] = file_name
+        STATS.incr("updated")
+    else:
+        file_name = save_json(export_path, res)
+        previous = {"count": res["count"], "id": res["id"],
+                    "file": file_name}
+        STATS.incr("new")
+    previous.update(mod_date=row["mod_date"], hash=digest,
+                    final_url=final_url)
+    MANIFEST.update(row["url"], **previous)
+    # Only pages already on disk are saved in the visited index, so that
+    # a killed export can be resumed from it
+    VISITED_PAGES.add(previous["count"], url, final_url)
+
+
+def queue_links(page_url, links, depth):
+    """Pushes the links of an article pointing inside the site to the
+    frontier, the ones seen before are dropped there
+    """
+    for link in links:
+        if not link or link in reject_links:
+            continue
+        link = urlparse.urljoin(page_url, get_absolute_link(link))
+        link = urlparse.urldefrag(link)[0]
+        if not link.startswith(BASE_URL) or \
+                link.lower().endswith(skip_extensions):
+            continue
+        if FRONTIER.push(canonicalize(link), link, depth):
+            STATS.incr("discovered")
+
+
+def crawl_rows(depth, max_pages):
+    """Rows for the pages queued at depth, until max_pages crawled pages
+    have been fetched
+    """
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    for url in FRONTIER.pop_level(depth):
+        if url in VISITED_PAGES:
+            continue
+        if max_pages and STATS.counters["crawled"] >= max_pages:
+            logger.info("Crawled %d pages, stopping", max_pages)
+            return
+        STATS.incr("crawled")
+        yield {"title": None, "url": url, "category": "", "pub_date": now,
+               "mod_date": now, "featured": False, "hits": "0",
+               "position": None, "crawled": True, "depth": depth}
+
+
+def export_pages(export_path, rows, pools, queues):
+    """Runs rows through the stages of the export, pools and queues are
+    the (fetch, parse, image) pools and queue sizes
+    """
+    fetch_pool, parse_pool, image_pool = pools
+    fetch_queue, parse_queue, image_queue = queues
+    pages = ordered_map(fetch_row, rows, fetch_pool, fetch_queue)
+    pages = claim_pages(pages)
+    pages = ordered_map(extract_row, pages, parse_pool, parse_queue)
+    pages = record_parse_times(pages)
+    if IMAGES:
+        pages = ordered_map(store_row_images, pages, image_pool, image_queue)
+    for row, final_url, res in pages:
+        save_page(export_path, row, final_url, res)
+
+
+def make_stages(workers, parse_workers, image_workers, queue_size,
+                fetch_queue, parse_queue, image_queue):
+    """The (fetch, parse, image) pools and queue sizes of the stages.
+    A stage without its own workers runs in the fetching threads
+    """
+    # The extraction processes are forked before any thread or connection
+    # exists, and inherit the globals set so far
+    parse_pool = make_pool(parse_workers, processes=True)
+    fetch_pool = make_pool(workers)
+    if parse_pool is None:
+        parse_pool = fetch_pool
+    image_pool = make_pool(image_workers)
+    if image_pool is None:
+        image_pool = fetch_pool
+    pools = (fetch_pool, parse_pool, image_pool)
+    queues = (fetch_queue or queue_size or 2 * workers,
+              parse_queue or queue_size or 2 * (parse_workers or workers),
+              image_queue or queue_size or 2 * (image_workers or workers))
+    return pools, queues
+
+
+def log_report(redirects, crawl):
+    # logging only formats with a mapping when it is not empty
+    counters = dict.fromkeys(("new", "updated", "unchanged", "skipped",
+                              "discovered", "crawled"), 0)
+    counters.update(STATS.counters)
+    logger.info("Export done: %(new)d new, %(updated)d updated, "
+                "%(unchanged)d unchanged and %(skipped)d skipped pages",
+                counters)
+    logger.info("Redirect map: %d old paths", redirects)
+    if crawl:
+        logger.info("Crawl: %(discovered)d links discovered, %(crawled)d "
+                    "pages fetched", counters)
+    logger.info("HTTP: %(requests)d requests (%(requests_per_sec).1f/s, "
+                "%(bytes_per_sec).0f bytes/s), %(retries)d retries, "
+                "%(failures)d failed attempts, %(errors)d errors, "
+                "concurrency limit %(concurrency_limit).1f "
+                "(lowest %(lowest_concurrency_limit).1f)", FETCHER.report())
+    for stage, histogram in sorted(STATS.stages.items()):
+        logger.info("Stage %s: %d calls, %.1fs, %.1fms mean, "
+                    "%dms p90", stage, histogram.count, histogram.total,
+                    histogram.total * 1000 / histogram.count,
+                    histogram.percentile(0.9))
+
+
+def export_news(offset, limit, force, export_path, workers, parse_workers,
+                queue_size, resume, cache_size, cache_only, extractor,
+                output_format, shard_size, incremental, skip_images, timeout,
+                retries, latency_target, shard=None, stats_path=None,
+                crawl=False, max_depth=3, max_pages=0, crawl_workers=2,
+                crawl_delay=0.5, input_path="to_import", base_url=None,
+                image_workers=0, fetch_queue=0, parse_queue=0,
+                image_queue=0):
+    global FETCHER, VISITED_PAGES, COUNTER, CACHE, CACHE_ONLY, EXTRACT
+    global WRITER, MANIFEST, IMAGES, STATS, SHARDED
+    global FRONTIER, MAX_DEPTH, CRAWL_DELAY, REDIRECTS, BASE_URL
+    STATS = Stats()
+    REDIRECTS = {}
+    if shard:
+        shard = parse_shard(shard)
+    if shard and crawl:
+        # The pages found by a shard could be in any other shard
+        parser.error("--crawl can not be used with --shard")
+    SHARDED = bool(shard)
+    if base_url:
+        BASE_URL = base_url.rstrip("/")
+    EXTRACT = EXTRACTORS[extractor]
+    pools, queues = make_stages(workers, parse_workers, image_workers,
+                                queue_size, fetch_queue, parse_queue,
+                                image_queue)
+    # Pages and images share the connections and the concurrency limit
+    limiter = AdaptiveLimiter(workers + image_workers,
+                              latency_target=latency_target)
+    FETCHER = Fetcher(get_session(workers + image_workers), limiter, timeout,
+                      retries)
+    if not os.path.exists(export_path):
+        os.makedirs(export_path)
+    CACHE = None
+    if cache_size:
+        CACHE = ResponseCache(export_path, cache_size * 1024 * 1024)
+    CACHE_ONLY = cache_only
+    WRITER = None
+    if output_format == "packed":
+        WRITER = PackedWriter(export_path, shard_size,
+                              append=resume or incremental)
+    IMAGES = None
+    if not skip_images:
+        IMAGES = ImageStore(export_path, FETCHER, offline=cache_only)
+    VISITED_PAGES = VisitedIndex(export_path, resume=resume)
+    MANIFEST = Manifest(export_path, load=resume or incremental)
+    COUNTER = max(VISITED_PAGES.next_count, MANIFEST.next_count())
+    FRONTIER = Frontier(export_path) if crawl else None
+    MAX_DEPTH = max_depth
+    CRAWL_DELAY = crawl_delay
+    rows = iter_rows(input_path, offset, limit, shard)
+    if incremental:
+        rows = check_unchanged(rows)
+    try:
+        export_pages(export_path, rows, pools, queues)
+        if FRONTIER:
+            # Be gentle with the site: the crawl has its own, lower,
+            # concurrency and a delay between the requests
+            limiter.maximum = min(workers + image_workers, crawl_workers)
+            limiter.limit = min(limiter.limit, limiter.maximum)
+            limiter.lowest = min(limiter.lowest, limiter.limit)
+            for depth in range(1, max_depth + 1):
+                export_pages(export_path, crawl_rows(depth, max_pages),
+                             pools, queues)
+    finally:
+        close_pools(*pools)
+        if FRONTIER:
+            FRONTIER.close()
+    VISITED_PAGES.close()
+    add_aliases(MANIFEST, REDIRECTS)
+    MANIFEST.save()
+    redirects = write_redirect_map(export_path, MANIFEST)
+    if IMAGES:
+        IMAGES.save()
+    if WRITER:
+        WRITER.close()
+    log_report(redirects, crawl)
+    if stats_path:
+        STATS.save(stats_path, http=FETCHER.report())
 
 
 def main(*args, **kwargs):
@@ -154,8 +705,19 @@ def main(*args, **kwargs):
         cmd_args = sys.argv[3:]
     else:
         cmd_args = sys.argv[1:]
+    if cmd_args and cmd_args[0] == "merge":
+        return merge.main(cmd_args[1:])
     options = vars(parser.parse_args(cmd_args))
     original_path = options["export_path"]
     if "force" in options and options["force"]:
         shutil.rmtree(original_path)
-    export_news(**options)
+    profile = options.pop("profile")
+    if profile:
+        cProfile.runctx("export_news(**options)", globals(), locals(),
+                        profile)
+    else:
+        export_news(**options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import re
+
+from bs4 import BeautifulSoup
+from bs4 import UnicodeDammit
+
+try:
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+
+# Where the article starts in the raw page: everything before it (head,
+# menus, banners) can be skipped by the lxml parser
+ARTICLE_START = re.compile(
+    r"<div\b[^>]*\bclass\s*=\s*[\"']?[^\"'>]*\bitem-page", re.IGNORECASE)
+ARTICLE_XPATH = ("//div[contains(concat(' ', normalize-space(@class), ' '),"
+                 " ' item-page ')]")
+# BeautifulSoup get_text leaves out scripts and styles
+TEXT_XPATH = ".//text()[not(ancestor::script or ancestor::style)]"
+
+# html.parser keeps everything up to the closing tag in a paragraph,
+# libxml2 closes it at the first block element (or the next paragraph)
+PARAGRAPH_OPEN = re.compile(r"<p\b[^>]*>", re.IGNORECASE)
+PARAGRAPH_CLOSE = re.compile(r"</p\s*>", re.IGNORECASE)
+BLOCK_OPEN = re.compile(
+    r"<(?:address|blockquote|center|dir|div|dl|fieldset|form|h[1-6]|hr|"
+    r"menu|ol|p|pre|table|ul)\b", re.IGNORECASE)
+
+
+def join_paragraphs(paragraphs):
+    return "".join("<p>" + paragraph + "</p>"
+                   for paragraph in paragraphs if paragraph)
+
+
+def extract_bs4(content):
+    """Returns the images (with src as found in the page), the text, the
+    links and the title (first h1/h2) of the div.item-page article.
+    None if the page has no article
+    """
+    parser = BeautifulSoup(content, 'html.parser')
+    articles = parser.select("div.item-page")
+    if not articles:
+        return None
+    article = articles[0]
+    images = []
+    for image in article.select("img"):
+        if "src" in image.attrs:
+            images.append({"alt": image.get("alt", ""),
+                           "src": image.get("src")})
+    text = join_paragraphs(paragraph.get_text().strip()
+                           for paragraph in article.select("p"))
+    links = [link.get("href") for link in article.select("a[href]")]
+    titles = article.select("h1, h2")
+    title = titles[0].get_text().strip() if titles else ""
+    return {"images": images, "text": text, "links": links, "title": title}
+
+
+def decode(content):
+    """Decodes the page like BeautifulSoup does: declared encoding
+    first, then utf-8 and windows-1252
+    """
+    if isinstance(content, unicode):
+        return content
+    return UnicodeDammit(content, is_html=True).unicode_markup
+
+
+def has_open_paragraphs(html):
+    """Whether a paragraph is left open or holds a block element, where
+    the two parsers disagree
+    """
+    for match in PARAGRAPH_OPEN.finditer(html):
+        close = PARAGRAPH_CLOSE.search(html, match.end())
+        if close is None or \
+                BLOCK_OPEN.search(html, match.end(), close.start()):
+            return True
+    return False
+
+
+def element_text(element):
+    return unicode("".join(element.xpath(TEXT_XPATH)).strip())
+
+
+def extract_lxml(content):
+    """Same as extract_bs4 but parses with libxml2, starting from the
+    article div instead of the top of the page. Falls back to
+    extract_bs4 for the malformed paragraphs libxml2 repairs differently
+    """
+    html = decode(content)
+    if not html.strip():
+        return None
+    match = ARTICLE_START.search(html)
+    if match:
+        html = html[match.start():]
+    if has_open_paragraphs(html):
+        return extract_bs4(content)
+    articles = lxml.html.document_fromstring(html).xpath(ARTICLE_XPATH)
+    if not articles:
+        return None
+    article = articles[0]
+    images = []
+    for image in article.iter("img"):
+        if "src" in image.attrib:
+            images.append({"alt": unicode(image.get("alt", "")),
+                           "src": unicode(image.get("src"))})
+    text = join_paragraphs(element_text(paragraph)
+                           for paragraph in article.iter("p"))
+    links = [unicode(link.get("href")) for link in article.iter("a")
+             if "href" in link.attrib]
+    titles = article.xpath(".//*[self::h1 or self::h2]")
+    title = element_text(titles[0]) if titles else ""
+    return {"images": images, "text": text, "links": links, "title": title}
+
+
+EXTRACTORS = {"bs4": extract_bs4}
+if HAS_LXML:
+    EXTRACTORS["lxml"] = extract_lxml
+DEFAULT_EXTRACTOR = "lxml" if HAS_LXML else "bs4"
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+import random
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger("unibo.violareggiocalabriamigration.export")
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def get_session(workers):
+    """Returns a session whose keep-alive pool can serve all the workers"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(workers, 1))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class AdaptiveLimiter(object):
+    """AIMD concurrency limit: every request answered within
+    latency_target raises the limit by 1/limit (about +1 per round of
+    requests), a failure or a slow answer halves it. Decreases are at
+    most one per latency_target, so that a burst of failures from the
+    same round only counts once
+    """
+
+    def __init__(self, maximum, minimum=1, latency_target=2.0):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.latency_target = latency_target
+        self.limit = float(maximum)
+        self.lowest = self.limit
+        self.active = 0
+        self.last_decrease = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.active >= int(self.limit):
+                self.condition.wait()
+            self.active += 1
+
+    def release(self, latency, failed):
+        with self.condition:
+            self.active -= 1
+            now = time.time()
+            if failed or latency > self.latency_target:
+                if now - self.last_decrease > self.latency_target:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self.lowest = min(self.lowest, self.limit)
+                    self.last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+
+class Fetcher(object):
+    """requests.Session.get with a timeout, retries with jittered
+    exponential backoff on connection errors, timeouts and 5xx/429
+    answers, and an adaptive concurrency limit
+    """
+
+    def __init__(self, session, limiter, timeout=30, retries=3, backoff=0.5):
+        self.session = session
+        self.limiter = limiter
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.stats = {"requests": 0, "retries": 0, "failures": 0,
+                      "errors": 0, "bytes": 0}
+
+    def count(self, **counters):
+        with self.lock:
+            for key, value in counters.items():
+                self.stats[key] += value
+
+    def get(self, url, **kwargs):
+        """Returns the response, which may still be a 5xx one when the
+        retries are exhausted. Raises the last connection error/timeout
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.count(retries=1)
+                time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+            req = error = None
+            self.limiter.acquire()
+            start = time.time()
+            try:
+                req = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            finally:
+                failed = req is None or req.status_code in RETRY_STATUSES
+                self.limiter.release(time.time() - start, failed)
+            self.count(requests=1, failures=int(failed))
+            if not failed:
+                if kwargs.get("stream"):
+                    size = req.headers.get("Content-Length") or 0
+                else:
+                    size = len(req.content)
+                self.count(bytes=int(size))
+                return req
+            logger.info("Attempt %d for '%s' failed: %s", attempt + 1, url,
+                        error or req.status_code)
+        self.count(errors=1)
+        if error is not None:
+            raise error
+        return req
+
+    def report(self):
+        with self.lock:
+            report = dict(self.stats)
+        elapsed = time.time() - self.started
+        report["elapsed"] = elapsed
+        report["requests_per_sec"] = report["requests"] / elapsed
+        report["bytes_per_sec"] = report["bytes"] / elapsed
+        report["concurrency_limit"] = self.limiter.limit
+        report["lowest_concurrency_limit"] = self.limiter.lowest
+        return report
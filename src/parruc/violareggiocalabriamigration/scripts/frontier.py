@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import math
+import os
+import shutil
+
+
+class BloomFilter(object):
+    """Compact set of strings: false positives happen with about
+    error_rate probability once capacity items are added, false
+    negatives never. One million urls at 1% take 1.2MB
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.01):
+        self.size = int(math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key):
+        # Double hashing: the i-th position is h1 + i * h2
+        digest = hashlib.md5(key.encode("utf-8")).hexdigest()
+        first, second = int(digest[:16], 16), int(digest[16:], 16)
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self.positions(key))
+
+    def add(self, key):
+        """Adds key, returns False if it was (probably) already there"""
+        added = False
+        for position in self.positions(key):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        return added
+
+
+class Frontier(object):
+    """Urls to crawl, kept on disk in a file per depth so that memory
+    does not grow with the size of the site. Urls are pushed only the
+    first time they are seen
+    """
+
+    dir_name = ".frontier"
+
+    def __init__(self, export_path, capacity=1000000):
+        self.path = os.path.join(export_path, self.dir_name)
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        os.makedirs(self.path)
+        self.seen = BloomFilter(capacity)
+        self.files = {}
+
+    def level_path(self, depth):
+        return os.path.join(self.path, "depth-%d" % depth)
+
+    def mark_seen(self, key):
+        self.seen.add(key)
+
+    def push(self, key, url, depth):
+        """Queues url (whose canonical form is key) at depth"""
+        if not self.seen.add(key):
+            return False
+        if depth not in self.files:
+            self.files[depth] = io.open(self.level_path(depth), "a",
+                                        encoding="utf-8")
+        self.files[depth].write(url + "\n")
+        return True
+
+    def pop_level(self, depth):
+        """Yields the urls queued at depth, then forgets them"""
+        level_file = self.files.pop(depth, None)
+        if level_file is None:
+            return
+        level_file.close()
+        with io.open(self.level_path(depth), encoding="utf-8") as urls:
+            for url in urls:
+                yield url.rstrip("\n")
+        os.remove(self.level_path(depth))
+
+    def close(self):
+        for level_file in self.files.values():
+            level_file.close()
+        shutil.rmtree(self.path)
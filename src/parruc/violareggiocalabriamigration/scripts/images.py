@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import requests
+
+logger = logging.getLogger("unibo.violareggiocalabriamigration.export")
+
+
+class ImageStore(object):
+    """Content addressed store of the images found in the exported pages.
+    Every image is saved once in .images/<sha1[:2]>/<sha1> and
+    .images/images.json maps each url to its blob, so that the same image
+    reached from different urls is stored once and an url is downloaded
+    at most once across runs
+    """
+
+    dir_name = ".images"
+    map_name = "images.json"
+
+    def __init__(self, export_path, fetcher, offline=False, save_every=100):
+        self.export_path = export_path
+        self.path = os.path.join(export_path, self.dir_name)
+        self.map_path = os.path.join(self.path, self.map_name)
+        self.fetcher = fetcher
+        self.offline = offline
+        self.save_every = save_every
+        self.unsaved = 0
+        self.urls = {}
+        self.broken = set()
+        self.downloading = {}
+        self.lock = threading.Lock()
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        if os.path.exists(self.map_path):
+            with open(self.map_path) as map_file:
+                self.urls = json.load(map_file)
+
+    def get(self, url):
+        """Returns the entry (blob path relative to the export folder,
+        size) for url, downloading it if needed. None if it is broken
+        """
+        with self.lock:
+            if url in self.urls:
+                return self.urls[url]
+            if url in self.broken or self.offline:
+                return None
+            downloaded = self.downloading.get(url)
+            if downloaded is None:
+                downloaded = self.downloading[url] = threading.Event()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            # Another worker is downloading the same url
+            downloaded.wait()
+            return self.urls.get(url)
+        try:
+            entry = self.download(url)
+        finally:
+            with self.lock:
+                del self.downloading[url]
+            downloaded.set()
+        return entry
+
+    def download(self, url):
+        tmp_path = os.path.join(
+            self.path, "%s.tmp" % threading.current_thread().ident)
+        digest = hashlib.sha1()
+        size = 0
+        try:
+            req = self.fetcher.get(url, stream=True)
+            req.raise_for_status()
+            with open(tmp_path, "wb") as tmp_file:
+                for chunk in req.iter_content(64 * 1024):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    tmp_file.write(chunk)
+        except (requests.RequestException, IOError, OSError):
+            logger.warning("Found a broken image in '%s'", url)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with self.lock:
+                self.broken.add(url)
+            return None
+        key = digest.hexdigest()
+        blob = os.path.join(self.dir_name, key[:2], key)
+        blob_path = os.path.join(self.export_path, blob)
+        with self.lock:
+            if os.path.exists(blob_path):
+                os.remove(tmp_path)
+            else:
+                if not os.path.exists(os.path.dirname(blob_path)):
+                    os.makedirs(os.path.dirname(blob_path))
+                os.rename(tmp_path, blob_path)
+            entry = self.urls[url] = {"blob": blob, "size": size}
+            self.unsaved += 1
+            if self.unsaved >= self.save_every:
+                self.save()
+        return entry
+
+    def save(self):
+        """Must be called holding the lock (or once the workers are done)"""
+        with open(self.map_path + ".tmp", "w") as map_file:
+            json.dump(self.urls, map_file)
+        os.rename(self.map_path + ".tmp", self.map_path)
+        self.unsaved = 0
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import os
+
+from parruc.violareggiocalabriamigration.scripts.visited import canonicalize
+
+
+def content_hash(data):
+    """Digest of an exported item, ignoring its position in the export"""
+    content = dict((key, value) for key, value in data.items()
+                   if key != "count")
+    return hashlib.sha1(json.dumps(content, sort_keys=True)).hexdigest()
+
+
+class Manifest(object):
+    """What the last exports saved for every row url: the Joomla
+    modification date, the content hash, the count, the id, the file
+    name and the final (redirected) url.
+    Every update is appended to a journal right away, so that a killed
+    export loses no entry of the pages it saved; save rewrites the whole
+    manifest every save_every updates and empties the journal
+    """
+
+    file_name = ".manifest.json"
+    journal_name = ".manifest.journal"
+
+    def __init__(self, export_path, load=True, save_every=100):
+        self.path = os.path.join(export_path, self.file_name)
+        self.journal_path = os.path.join(export_path, self.journal_name)
+        self.load = load
+        self.save_every = save_every
+        self.unsaved = 0
+        self.entries = {}
+        self.journal = None
+        self.truncated = False
+        if load and os.path.exists(self.path):
+            with open(self.path) as manifest_file:
+                self.entries = json.load(manifest_file)
+        if load and os.path.exists(self.journal_path):
+            self.replay()
+
+    def replay(self):
+        """Applies the updates of the journal saved after the manifest"""
+        with open(self.journal_path) as journal:
+            for line in journal:
+                if not line.endswith("\n"):
+                    # The export was killed while writing this line
+                    self.truncated = True
+                    break
+                try:
+                    key, entry = json.loads(line)
+                except ValueError:
+                    # A line cut by an export killed before this one
+                    continue
+                self.entries[key] = entry
+
+    def get(self, url):
+        return self.entries.get(canonicalize(url))
+
+    def next_count(self):
+        counts = [entry["count"] for entry in self.entries.values()]
+        return max(counts) + 1 if counts else 0
+
+    def unchanged(self, url, mod_date):
+        """The entry of url if its modification date did not change"""
+        entry = self.get(url)
+        if entry and entry["mod_date"] == mod_date:
+            return entry
+        return None
+
+    def update(self, url, **entry):
+        key = canonicalize(url)
+        self.entries[key] = entry
+        if self.journal is None:
+            # A journal left by an export we are not continuing is stale
+            self.journal = open(self.journal_path,
+                                "a" if self.load else "w")
+            if self.truncated:
+                self.journal.write("\n")
+        self.journal.write(json.dumps([key, entry]) + "\n")
+        self.journal.flush()
+        self.unsaved += 1
+        if self.unsaved >= self.save_every:
+            self.save()
+
+    def save(self):
+        with open(self.path + ".tmp", "w") as manifest_file:
+            json.dump(self.entries, manifest_file)
+        os.rename(self.path + ".tmp", self.path)
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.truncated = False
+        self.unsaved = 0
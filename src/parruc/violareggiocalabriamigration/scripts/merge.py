@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Merges the exports made with --shard i/N into a single export:
+pages reached from rows of different shards are kept once, clashing
+ids and file names get a numeric suffix and the count follows the
+position of the rows in the dumps.
+"""
+from __future__ import unicode_literals
+
+import argparse
+import json
+import logging
+import os
+import shutil
+
+from parruc.violareggiocalabriamigration.packed import is_packed
+from parruc.violareggiocalabriamigration.packed import PackedReader
+from parruc.violareggiocalabriamigration.packed import PackedWriter
+from parruc.violareggiocalabriamigration.scripts.images import ImageStore
+from parruc.violareggiocalabriamigration.scripts.manifest import Manifest
+from parruc.violareggiocalabriamigration.scripts.redirectmap import \
+    write_redirect_map
+from parruc.violareggiocalabriamigration.scripts.visited import canonicalize
+from parruc.violareggiocalabriamigration.scripts.visited import VisitedIndex
+from plone.i18n.normalizer import idnormalizer
+
+logger = logging.getLogger("unibo.violareggiocalabriamigration.export")
+
+usage = "usage: %(prog)s merge [options] shard [shard ...]"
+parser = argparse.ArgumentParser(usage=usage, description=__doc__)
+parser.add_argument(
+    "shards", nargs="+",
+    help="Export folders of the shards")
+parser.add_argument(
+    "-p", "--path", type=str, dest="export_path", default="exported",
+    help="Merged export folder, must be empty. Default is 'exported'")
+parser.add_argument(
+    "--format", choices=["files", "packed"], dest="output_format",
+    default="files",
+    help="Format of the merged export. Default is 'files'")
+parser.add_argument(
+    "--shard-size", type=int, dest="shard_size", default=1000,
+    help="Pages per shard of the packed format. Default is 1000")
+
+normalize = idnormalizer.normalize
+
+
+def iter_export(path):
+    """Yields (locator, item) for the items of an export in any format"""
+    if is_packed(path):
+        reader = PackedReader(path)
+        for item_id in reader.ids():
+            yield item_id, reader.get(item_id)
+        reader.close()
+        return
+    for file_name in sorted(os.listdir(path)):
+        if file_name.startswith(".") or not file_name.endswith(".json"):
+            continue
+        with open(os.path.join(path, file_name)) as item_file:
+            yield file_name, json.load(item_file)
+
+
+def unique(name, taken):
+    candidate = name
+    suffix = 0
+    while candidate in taken:
+        suffix += 1
+        candidate = "%s-%d" % (name, suffix)
+    taken.add(candidate)
+    return candidate
+
+
+def copy_blob(shard_path, export_path, blob):
+    target = os.path.join(export_path, blob)
+    if os.path.exists(target):
+        return
+    source = os.path.join(shard_path, blob)
+    if not os.path.exists(source):
+        logger.warning("Missing image blob '%s'", source)
+        return
+    if not os.path.exists(os.path.dirname(target)):
+        os.makedirs(os.path.dirname(target))
+    shutil.copyfile(source, target)
+
+
+def sorted_entries(shards):
+    """First pass: only what is needed to sort and deduplicate the items,
+    which are then read again one at a time. (position, shard index,
+    count, locator, canonical url) in the order of the rows in the dumps
+    """
+    entries = []
+    for shard_index, shard_path in enumerate(shards):
+        for locator, item in iter_export(shard_path):
+            position = item.get("position", item["count"])
+            entries.append((position, shard_index, item["count"], locator,
+                            canonicalize(item["url"])))
+    entries.sort()
+    return entries
+
+
+def merge_bookkeeping(export_path, shards, assigned):
+    """Merges the image stores, manifests and visited indexes of the
+    shards, so that the merged export can be updated with --incremental
+    or --resume. assigned maps (shard index, count) of the kept items to
+    their new count, id and file
+    """
+    images = ImageStore(export_path, None, offline=True)
+    manifest = Manifest(export_path, load=False)
+    visited = VisitedIndex(export_path)
+    for shard_index, shard_path in enumerate(shards):
+        shard_images = ImageStore(shard_path, None, offline=True)
+        for url, entry in shard_images.urls.items():
+            copy_blob(shard_path, export_path, entry["blob"])
+            images.urls[url] = entry
+        for key, entry in Manifest(shard_path).entries.items():
+            new = assigned.get((shard_index, entry["count"]))
+            if not new:
+                continue
+            entry.update(new)
+            manifest.entries[key] = entry
+            visited.add(entry["count"], key, entry["final_url"])
+    images.save()
+    manifest.save()
+    write_redirect_map(export_path, manifest)
+    visited.close()
+
+
+def merge_exports(export_path, shards, output_format, shard_size):
+    entries = sorted_entries(shards)
+    writer = None
+    if output_format == "packed":
+        writer = PackedWriter(export_path, shard_size)
+    readers = dict((index, PackedReader(path))
+                   for index, path in enumerate(shards) if is_packed(path))
+    kept = {}
+    assigned = {}
+    taken_ids = set()
+    taken_files = set()
+    for position, shard_index, count, locator, key in entries:
+        if key in kept:
+            logger.info("Dropping duplicate of '%s' from %s", key,
+                        shards[shard_index])
+            assigned[(shard_index, count)] = kept[key]
+            continue
+        shard_path = shards[shard_index]
+        if shard_index in readers:
+            item = readers[shard_index].get(locator)
+        else:
+            with open(os.path.join(shard_path, locator)) as item_file:
+                item = json.load(item_file)
+        item["count"] = len(kept)
+        for image in item["images"]:
+            if image.get("blob"):
+                copy_blob(shard_path, export_path, image["blob"])
+        file_name = None
+        if writer:
+            writer.write(item)
+        else:
+            item["id"] = unique(item["id"], taken_ids)
+            file_name = unique(normalize(item["title"].strip()),
+                               taken_files) + ".json"
+            with open(os.path.join(export_path, file_name), "w") as f:
+                json.dump(item, f)
+        kept[key] = assigned[(shard_index, count)] = {
+            "count": item["count"], "id": item["id"], "file": file_name}
+    for reader in readers.values():
+        reader.close()
+    if writer:
+        writer.close()
+
+    merge_bookkeeping(export_path, shards, assigned)
+    logger.info("Merged %d pages, %d duplicates dropped", len(kept),
+                len(entries) - len(kept))
+
+
+def main(cmd_args):
+    options = parser.parse_args(cmd_args)
+    if os.path.exists(options.export_path) and \
+            os.listdir(options.export_path):
+        parser.error("%s is not empty" % options.export_path)
+    if not os.path.exists(options.export_path):
+        os.makedirs(options.export_path)
+    merge_exports(options.export_path, options.shards,
+                  options.output_format, options.shard_size)
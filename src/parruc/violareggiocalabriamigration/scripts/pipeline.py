@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Helpers to chain the export stages. Every stage is a generator
+pulling from the previous one, so a stage only asks for more input when
+its bounded queue of pending tasks has room: that backpressure keeps
+memory flat however long the dump is.
+"""
+from collections import deque
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+
+def ordered_map(func, iterable, pool=None, queue_size=1):
+    """Like map but runs func on pool (in the current thread if None).
+    Results are yielded in input order and at most queue_size tasks
+    are pending at any time
+    """
+    if pool is None:
+        for arg in iterable:
+            yield func(arg)
+        return
+    pending = deque()
+    for arg in iterable:
+        pending.append(pool.apply_async(func, (arg,)))
+        if len(pending) >= queue_size:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def make_pool(workers, processes=False):
+    """A pool of workers threads (or processes), None to run inline"""
+    if processes and workers:
+        return Pool(workers)
+    if workers > 1:
+        return ThreadPool(workers)
+    return None
+
+
+def close_pools(*pools):
+    for pool in set(pools):
+        if pool is not None:
+            pool.terminate()
+            pool.join()
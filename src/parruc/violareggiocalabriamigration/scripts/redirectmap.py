@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""The redirect map of an export: a line per old path of the site with
+the path of its News Item, separated by a tab. Loaded in the site by the
+@@violareggiocalabriaredirects view.
+"""
+from __future__ import unicode_literals
+
+import io
+import os
+
+from parruc.violareggiocalabriamigration.scripts.visited import canonicalize
+
+MAP_NAME = "redirects.map"
+
+
+def key_path(key):
+    """The path (and query) of a canonical url, None for the home page"""
+    if "/" not in key:
+        return None
+    return key[key.index("/"):]
+
+
+def add_aliases(manifest, aliases):
+    """Records in the manifest entries the urls (aliases) whose rows
+    were dropped because they lead to a page already exported
+    """
+    owners = {}
+    for key, entry in manifest.entries.items():
+        owners[key] = owners[canonicalize(entry["final_url"])] = entry
+    for alias, target in aliases.items():
+        entry = owners.get(canonicalize(target))
+        if entry is None:
+            continue
+        alias = canonicalize(alias)
+        if alias not in entry.setdefault("aliases", []):
+            entry["aliases"].append(alias)
+
+
+def write_redirect_map(export_path, manifest):
+    redirects = {}
+    entries = sorted(manifest.entries.items(),
+                     key=lambda item: item[1]["count"])
+    for key, entry in entries:
+        dest = "/news/" + entry["id"]
+        keys = [key, canonicalize(entry["final_url"])] + \
+            entry.get("aliases", [])
+        for source in filter(None, map(key_path, keys)):
+            if source != dest:
+                redirects.setdefault(source, dest)
+    path = os.path.join(export_path, MAP_NAME)
+    with io.open(path + ".tmp", "w", encoding="utf-8") as map_file:
+        for source, dest in sorted(redirects.items()):
+            map_file.write("%s\t%s\n" % (source, dest))
+    os.rename(path + ".tmp", path)
+    return len(redirects)
+
+
+def read_redirect_map(path):
+    """The source -> dest dict of a redirect map"""
+    redirects = {}
+    with io.open(path, encoding="utf-8") as map_file:
+        for line in map_file:
+            source, dest = line.rstrip("\n").split("\t")
+            redirects[source] = dest
+    return redirects
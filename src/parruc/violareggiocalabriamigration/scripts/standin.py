@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""A local stand-in for the Joomla site, to benchmark the exporter
+without hitting the real one: /article/<n> are div.item-page articles
+linking to another article and to an image, /redir/<n> redirects to
+/article/<n> and /img/<n>.jpg are images of a given size. Every answer
+waits ``latency`` seconds.
+"""
+from __future__ import unicode_literals
+
+import io
+import os
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler
+from BaseHTTPServer import HTTPServer
+from SocketServer import ThreadingMixIn
+from xml.sax.saxutils import escape
+
+ARTICLE = """<html><head><title>Articolo %(n)d</title></head><body>
+<div class="header"><a href="/">Viola Reggio Calabria</a></div>
+<div class="item-page"><h2>Articolo %(n)d</h2>
+<p>La Viola vince la partita numero %(n)d &amp; festeggia.</p>
+<p>%(text)s</p>
+<p>Leggi anche <a href="/article/%(next)d">l'articolo %(next)d</a></p>
+<img src="/img/%(n)d.jpg" alt="Foto %(n)d"/>
+</div></body></html>"""
+
+TEXT = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def answer(self, status, body=b"", content_type="text/html",
+               headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 2:
+            return self.answer(404)
+        kind, name = parts
+        if kind == "redir":
+            return self.answer(301, headers=[("Location", "/article/" + name)])
+        if kind == "img" and name.endswith(".jpg"):
+            return self.answer(200, self.server.image, "image/jpeg")
+        if kind == "article" and name.isdigit():
+            n = int(name)
+            body = ARTICLE % {"n": n, "text": TEXT,
+                              "next": (n * 7 + 1) % self.server.articles}
+            return self.answer(200, body.encode("utf-8"),
+                               "text/html; charset=utf-8")
+        self.answer(404)
+
+
+class StandinServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # Many exporter workers connect at once
+    request_queue_size = 128
+
+    def __init__(self, latency=0.0, articles=1000, image_size=20 * 1024,
+                 port=0):
+        HTTPServer.__init__(self, ("127.0.0.1", port), StandinHandler)
+        self.latency = latency
+        self.articles = articles
+        self.image = b"\xff\xd8" + b"\0" * max(image_size - 2, 0)
+
+    @property
+    def base_url(self):
+        return "http://127.0.0.1:%d" % self.server_address[1]
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def write_dump(directory, base_url, rows, redirect_every=10):
+    """Writes a dump of rows <content> rows, like the one of the Joomla
+    content table the exporter reads. Every redirect_every-th row points
+    to a redirect
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    path = os.path.join(directory, "dump.xml")
+    with io.open(path, "w", encoding="utf-8") as dump:
+        dump.write('<?xml version="1.0" encoding="utf-8"?>\n'
+                   '<pma_xml_export><database name="joomla">'
+                   '<table name="jos_content">\n')
+        for n in range(rows):
+            kind = "redir" if redirect_every and n % redirect_every == 3 \
+                else "article"
+            modified = "0000-00-00 00:00:00" if n % 2 else \
+                "2016-02-02 11:00:00"
+            dump.write(
+                "<content><title>Articolo %d &amp; Viola</title>"
+                "<url>%s</url><publish_up>2015-01-01 10:00:00</publish_up>"
+                "<modified>%s</modified><featured>%d</featured>"
+                "<catid>%d</catid><hits>%d</hits></content>\n" % (
+                    n, escape("%s/%s/%d" % (base_url, kind, n)), modified,
+                    n % 2, n % 3, n))
+        dump.write('</table></database></pma_xml_export>\n')
+    return path
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from __future__ import division
+
+import json
+import math
+import resource
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Histogram(object):
+    """Latencies in power of two buckets of milliseconds"""
+
+    def __init__(self):
+        self.buckets = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        milliseconds = seconds * 1000
+        bucket = 0 if milliseconds <= 1 else \
+            int(math.ceil(math.log(milliseconds, 2)))
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction):
+        """Upper bound in milliseconds of the bucket holding the
+        given fraction of the samples
+        """
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= fraction * self.count:
+                return 2 ** bucket
+        return 0
+
+    def report(self):
+        return {"count": self.count,
+                "total_seconds": self.total,
+                "mean_ms": self.total * 1000 / self.count
+                if self.count else 0,
+                "max_ms": self.max * 1000,
+                "p50_ms": self.percentile(0.5),
+                "p90_ms": self.percentile(0.9),
+                "p99_ms": self.percentile(0.99),
+                "buckets": dict(("<=%dms" % 2 ** bucket, count)
+                                for bucket, count in self.buckets.items())}
+
+
+class Stats(object):
+    """Counters and per stage latency histograms of an export, safe to
+    be updated from the worker threads
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counters = defaultdict(int)
+        self.stages = defaultdict(Histogram)
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.stages[stage].add(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(stage, time.time() - start)
+
+    def report(self, **extra):
+        """The stats as a dict; peak RSS (in KB) includes the extraction
+        processes
+        """
+        with self.lock:
+            report = {"elapsed_seconds": time.time() - self.started,
+                      "counters": dict(self.counters),
+                      "stages": dict((stage, histogram.report())
+                                     for stage, histogram
+                                     in self.stages.items()),
+                      "peak_rss_kb": resource.getrusage(
+                          resource.RUSAGE_SELF).ru_maxrss,
+                      "peak_children_rss_kb": resource.getrusage(
+                          resource.RUSAGE_CHILDREN).ru_maxrss}
+        report.update(extra)
+        return report
+
+    def save(self, path, **extra):
+        with open(path, "w") as report_file:
+            json.dump(self.report(**extra), report_file, indent=2,
+                      sort_keys=True)
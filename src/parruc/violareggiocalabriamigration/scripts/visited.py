@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import logging
+import os
+import threading
+import urlparse
+
+logger = logging.getLogger("unibo.violareggiocalabriamigration.export")
+
+
+def canonicalize(url):
+    """Returns the key used to compare urls: scheme, host case, "www."
+    prefix, default port, fragment and trailing slash are not significant
+    """
+    url = url.strip()
+    if "://" not in url:
+        url = "http://" + url.lstrip("/")
+    parts = urlparse.urlsplit(url)
+    netloc = parts.netloc.lower()
+    if netloc.startswith("www."):
+        netloc = netloc[4:]
+    if netloc.endswith(":80"):
+        netloc = netloc[:-3]
+    key = netloc + parts.path.rstrip("/")
+    if parts.query:
+        key += "?" + parts.query
+    return key
+
+
+class VisitedIndex(object):
+    """Set of the exported pages, persisted as an append only log in the
+    export folder. Every line holds the count given to the page and the
+    canonical urls (requested and redirected) that lead to it
+    """
+
+    file_name = ".visited"
+
+    def __init__(self, export_path, resume=False):
+        self.path = os.path.join(export_path, self.file_name)
+        self.keys = set()
+        self.next_count = 0
+        self.lock = threading.Lock()
+        truncated = False
+        if resume and os.path.exists(self.path):
+            with io.open(self.path, encoding="utf-8") as log:
+                for line in log:
+                    if not line.endswith("\n"):
+                        # The export was killed while writing this line
+                        truncated = True
+                        break
+                    if not line.strip():
+                        continue
+                    fields = line.rstrip("\n").split("\t")
+                    self.next_count = max(self.next_count,
+                                          int(fields[0]) + 1)
+                    self.keys.update(fields[1:])
+            logger.info("Resuming export: %d pages already visited",
+                        len(self.keys))
+        self.log = io.open(self.path, "a" if resume else "w",
+                           encoding="utf-8")
+        if truncated:
+            self.log.write("\n")
+
+    def __contains__(self, url):
+        return canonicalize(url) in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def reserve(self, *urls):
+        """Marks urls as visited for the current run only: they are
+        saved by add once their page is on disk
+        """
+        keys = [canonicalize(url) for url in urls]
+        with self.lock:
+            self.keys.update(keys)
+
+    def add(self, count, *urls):
+        keys = [canonicalize(url) for url in urls]
+        with self.lock:
+            self.log.write("\t".join([unicode(count)] + keys) + "\n")
+            self.log.flush()
+            self.keys.update(keys)
+            self.next_count = max(self.next_count, count + 1)
+
+    def close(self):
+        self.log.close()
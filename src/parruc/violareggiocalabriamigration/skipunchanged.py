@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+
+from BTrees.OOBTree import OOBTree
+from zope.annotation.interfaces import IAnnotations
+from zope.interface import classProvides, implements
+
+from collective.transmogrifier.interfaces import ISection, ISectionBlueprint
+from Products.CMFCore.utils import getToolByName
+
+logger = logging.getLogger("unibo.violareggiocalabriamigration.import")
+
+# Content hash of every imported item, by path, in the site annotations
+REGISTRY_KEY = "parruc.violareggiocalabriamigration.hashes"
+# Counts of the last run, in the transmogrifier annotations
+STATS_KEY = "parruc.violareggiocalabriamigration.skipunchanged"
+
+
+class HashRegistry(object):
+    """The content hashes of the imported items and the paths of the
+    objects already there (found with a single catalog query), to tell
+    new, changed and unchanged items apart
+    """
+
+    def __init__(self, context, portal_type='News Item'):
+        annotations = IAnnotations(context)
+        if REGISTRY_KEY not in annotations:
+            annotations[REGISTRY_KEY] = OOBTree()
+        self.hashes = annotations[REGISTRY_KEY]
+        catalog = getToolByName(context, 'portal_catalog')
+        root = "/".join(context.getPhysicalPath())
+        brains = catalog.unrestrictedSearchResults(portal_type=portal_type,
+                                                   path=root)
+        self.existing = set(brain.getPath()[len(root):] for brain in brains)
+
+    def state(self, path, digest):
+        if path not in self.existing:
+            return "new"
+        if self.hashes.get(path) != digest:
+            return "changed"
+        return "unchanged"
+
+    def update(self, path, digest):
+        # Rolled back with the transaction if the import fails
+        self.hashes[path] = digest
+
+
+class SkipUnchangedSection(object):
+    """Drops the items whose object exists and whose content hash (the
+    ``_hash`` key set by the source) didnt change since the last import,
+    before they are constructed, updated and reindexed
+    """
+    classProvides(ISectionBlueprint)
+    implements(ISection)
+
+    def __init__(self, transmogrifier, name, options, previous):
+        self.previous = previous
+        self.context = transmogrifier.context
+        self.hashkey = options.get('hash-key', '_hash')
+        self.pathkey = options.get('path-key', '_path')
+        self.portal_type = options.get('portal-type', 'News Item')
+        self.stats = IAnnotations(transmogrifier).setdefault(
+            STATS_KEY, {"new": 0, "changed": 0, "unchanged": 0})
+
+    def __iter__(self):
+        registry = HashRegistry(self.context, self.portal_type)
+        for item in self.previous:
+            digest = item.get(self.hashkey)
+            path = item.get(self.pathkey)
+            if not digest or not path:
+                yield item
+                continue
+            state = registry.state(path, digest)
+            self.stats[state] += 1
+            if state == "unchanged":
+                image = item.get('_image')
+                if image and os.path.exists(image["file"]):
+                    os.remove(image["file"])
+                continue
+            registry.update(path, digest)
+            yield item
+        logger.info("%(new)d new, %(changed)d changed and %(unchanged)d "
+                    "unchanged items", self.stats)
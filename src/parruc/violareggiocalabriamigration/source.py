@@ -3,23 +3,62 @@ from collective.transmogrifier.interfaces import ISection
 from collective.transmogrifier.interfaces import ISectionBlueprint
 from collective.transmogrifier.utils import resolvePackageReferenceOrFile
 from datetime import datetime
+from parruc.violareggiocalabriamigration.commit import get_cursor
+from parruc.violareggiocalabriamigration.commit import set_cursor
+from parruc.violareggiocalabriamigration.packed import is_packed
+from parruc.violareggiocalabriamigration.packed import PackedReader
+from parruc.violareggiocalabriamigration.scripts.fetcher import get_session
+from parruc.violareggiocalabriamigration.scripts.manifest import content_hash
+from parruc.violareggiocalabriamigration.scripts.manifest import Manifest
+from parruc.violareggiocalabriamigration.scripts.pipeline import close_pools
+from parruc.violareggiocalabriamigration.scripts.pipeline import make_pool
+from parruc.violareggiocalabriamigration.scripts.pipeline import ordered_map
+from parruc.violareggiocalabriamigration.skipunchanged import HashRegistry
+from zope.annotation.interfaces import IAnnotations
 from zope.interface import classProvides
 from zope.interface import implements
 
+import bisect
 import json
 import logging
 import os.path
-import requests
+import shutil
+import tempfile
 
 
 logger = logging.getLogger("unibo.violareggiocalabriamigration.import")
 logging.basicConfig(level=logging.WARNING)
 
+# Items in the export, in the transmogrifier annotations
+TOTAL_KEY = "parruc.violareggiocalabriamigration.total"
+# Whether the source read up to the end of the export, same place
+END_KEY = "parruc.violareggiocalabriamigration.end"
+# Index in the export (sorted by count) of the first item read and of the
+# one after the last item read, same place. Counts are not dense, the
+# progress of the import is measured with these
+START_INDEX_KEY = "parruc.violareggiocalabriamigration.start_index"
+STOP_INDEX_KEY = "parruc.violareggiocalabriamigration.stop_index"
+
 
 class Source(object):
     """Based on transmogrify.filesystem.source.FilesystemSource
     this section which can read files from the filesystem
-    and set items'pipeline
+    and set items'pipeline.
+    The images of the next ``prefetch`` items are downloaded by
+    ``prefetch-workers`` threads while the previous items go through the
+    rest of the pipeline. Images are never held in memory: they are
+    streamed to temporary files, passed in the ``_image`` key and
+    consumed by the imagesetter section. Items whose object exists with
+    the same content hash come without image, the skipunchanged section
+    drops them.
+    Items are read in the order of the count the exporter gave them,
+    which only grows, so that the new items of an incremental export
+    come after the ones already there. The position of an item is its
+    count. Only ``batch`` items (0 for all) are read, from the ``start``
+    position or else from the cursor. The source moves the cursor past
+    every item it reads, also the ones dropped later in the pipeline, the
+    commit section commits it and it is reset once the whole export is
+    imported
     """
 
     implements(ISection)
@@ -31,6 +70,151 @@ class Source(object):
         self.options = options
         self.previous = previous
         self.directory = resolvePackageReferenceOrFile(options['directory'])
+        self.prefetch = int(options.get('prefetch', 16))
+        self.workers = int(options.get('prefetch-workers', 4))
+        self.timeout = float(options.get('image-timeout', 30))
+        self.tmpdir = options.get('tmpdir') or None
+        self.imagedir = None
+        self.start = options.get('start', '').strip()
+        self.batch = int(options.get('batch', '').strip() or 0)
+        self.reader = None
+        self.total = 0
+        self.start_index = self.stop_index = 0
+        self.finished = False
+        self.session = get_session(self.workers)
+
+    def read(self, locator):
+        if self.reader:
+            return self.reader.get(locator)
+        with open(locator, 'rb') as input_file:
+            return json.loads(input_file.read())
+
+    def manifest_counts(self):
+        """The count of the items by locator, from the exporter manifest.
+        Files saved for more than one row are left out
+        """
+        counts = {}
+        for entry in Manifest(self.directory).entries.values():
+            if self.reader:
+                locator = entry["id"]
+            elif entry.get("file"):
+                locator = os.path.join(self.directory, entry["file"])
+            else:
+                continue
+            counts[locator] = None if locator in counts else entry["count"]
+        return counts
+
+    def item_locators(self):
+        """(count, locator) of the exported items, locators are file paths
+        (or ids for the packed format), sorted by count
+        """
+        if self.reader:
+            locators = self.reader.ids()
+        else:
+            locators = []
+            for dir_path, dir_names, file_names in os.walk(self.directory):
+                # Skip the exporter bookkeeping (visited index, caches...)
+                dir_names[:] = sorted(d for d in dir_names
+                                      if not d.startswith("."))
+                for file_name in sorted(file_names):
+                    if file_name.startswith(".") or \
+                            not file_name.endswith(".json"):
+                        continue
+                    locators.append(os.path.join(dir_path, file_name))
+        counts = self.manifest_counts()
+        entries = []
+        for locator in locators:
+            count = counts.get(locator)
+            if count is None:
+                # Exported before the manifest existed
+                count = self.read(locator)["count"]
+            entries.append((count, locator))
+        entries.sort()
+        return entries
+
+    def iter_metadata(self, start=0, batch=0):
+        """Yields (position, item) for batch (0 for all) exported items
+        from the start position on, only those are read
+        """
+        entries = self.item_locators()
+        self.total = len(entries)
+        first = bisect.bisect_left(entries, (start,))
+        stop = min(first + batch, self.total) if batch else self.total
+        self.start_index, self.stop_index = first, stop
+        self.finished = stop >= self.total
+        for position, locator in entries[first:stop]:
+            yield position, self.read(locator)
+
+    def iter_entries(self, registry, start, batch):
+        """Yields (position, item, content hash, unchanged) for batch items
+        from the start position on. Runs in the main thread, the only one
+        using the ZODB connection
+        """
+        for position, metadata in self.iter_metadata(start, batch):
+            digest = content_hash(metadata)
+            unchanged = registry.state(self.item_path(metadata),
+                                       digest) == "unchanged"
+            yield position, metadata, digest, unchanged
+
+    def item_path(self, metadata):
+        return u"/news/" + metadata["id"]
+
+    def temp_path(self):
+        image_file, path = tempfile.mkstemp(dir=self.imagedir)
+        os.close(image_file)
+        return path
+
+    def link_blob(self, image):
+        """Temporary file with the image saved by the exporter image
+        store, if any. The blob is hard linked when possible: the
+        imagesetter moves the file into the ZODB blob storage, which must
+        not take the export blob away
+        """
+        if not image.get("blob"):
+            return None
+        blob_path = os.path.join(self.directory, image["blob"])
+        if not os.path.exists(blob_path):
+            logger.warning("Missing image blob '%s'", blob_path)
+            return None
+        path = self.temp_path()
+        os.remove(path)
+        try:
+            os.link(blob_path, path)
+        except OSError:
+            shutil.copyfile(blob_path, path)
+        return path
+
+    def download(self, url):
+        """Streams url to a temporary file, None if it is broken"""
+        path = self.temp_path()
+        try:
+            req = self.session.get(url, timeout=self.timeout, stream=True)
+            req.raise_for_status()
+            with open(path, 'wb') as image_file:
+                for chunk in req.iter_content(64 * 1024):
+                    image_file.write(chunk)
+        except:
+            logger.warning("Found a broken image in '%s'", url)
+            os.remove(path)
+            return None
+        return path
+
+    def load_image(self, entry):
+        """Returns the entry and the first image of the item that can be
+        read, runs in the prefetch threads
+        """
+        position, metadata, digest, unchanged = entry
+        if unchanged:
+            return entry, None
+        for image in metadata["images"]:
+            url = image["src"]
+            # Exported without images, or the blob got lost
+            path = self.link_blob(image) or self.download(url)
+            if path is None:
+                continue
+            filename = url.split("/")[-1]
+            return entry, {"file": path, "filename": filename}
+        return entry, None
 
     def __iter__(self):
 
@@ -45,35 +229,54 @@ class Source(object):
         res["title"] = u"News"
         yield res
 
-        for dir_path, dir_names, file_names in os.walk(self.directory):
-            file_names.sort()
-            for file_name in file_names:
-                file_path = os.path.join(dir_path, file_name)
-                with open(file_path, 'rb') as input_file:
-                    input_data = input_file.read()
-                metadata = json.loads(input_data)
-                res['_type'] = u"News Item"
-                res['_path'] = u"/news/" + metadata["id"]
-                res['subjects'] = metadata["category"]
-                res['featured'] = metadata["featured"]
-                res["title"] = unicode(metadata["title"])
-                res["text"] = unicode(metadata["text"])
-                res["pub_date"] = datetime.strptime(metadata["pub_date"],
-                                                    '%Y-%m-%d %H:%M:%S')
-                res["mod_date"] = datetime.strptime(metadata["mod_date"],
-                                                    '%Y-%m-%d %H:%M:%S')
-                for image in metadata["images"]:
-                    data = None
-                    url = image["src"]
-                    try:
-                        req = requests.get(url)
-                        req.raise_for_status()
-                    except:
-                        logger.warning("Found a broken image in '%s'", url)
-                        continue
-                    data = req.content
-                    filename = url.split("/")[-1]
-                    res['image'] = {"data": data, "filename": filename}
-                    break
+        # Files the imagesetter didnt consume go away with the directory
+        self.imagedir = tempfile.mkdtemp(prefix="import-images",
+                                         dir=self.tmpdir)
+        context = self.transmogrifier.context
+        start = int(self.start) if self.start else get_cursor(context)
+        if is_packed(self.directory):
+            self.reader = PackedReader(self.directory)
+        entries = self.iter_entries(HashRegistry(context), start, self.batch)
+        pool = make_pool(self.workers)
+        items = ordered_map(self.load_image, entries, pool,
+                            max(self.prefetch, 1))
+        try:
+            for entry, image in items:
+                item = self.make_item(entry, image)
+                set_cursor(context, item['_position'] + 1)
+                yield item
+        finally:
+            close_pools(pool)
+            shutil.rmtree(self.imagedir, ignore_errors=True)
+            if self.reader:
+                self.reader.close()
+        annotations = IAnnotations(self.transmogrifier)
+        annotations[TOTAL_KEY] = self.total
+        annotations[END_KEY] = self.finished
+        annotations[START_INDEX_KEY] = self.start_index
+        annotations[STOP_INDEX_KEY] = self.stop_index
+        if self.finished:
+            logger.info("Imported the whole export, resetting the cursor")
+            set_cursor(context, 0)
 
-                yield res
+    def make_item(self, entry, image):
+        position, metadata, digest, unchanged = entry
+        res = {}
+        res['_type'] = u"News Item"
+        res['_path'] = self.item_path(metadata)
+        res['_hash'] = digest
+        res['_position'] = position
+        res['subjects'] = metadata["category"]
+        res['featured'] = metadata["featured"]
+        res["title"] = unicode(metadata["title"])
+        res["text"] = unicode(metadata["text"])
+        res["pub_date"] = datetime.strptime(metadata["pub_date"],
+                                            '%Y-%m-%d %H:%M:%S')
+        res["mod_date"] = datetime.strptime(metadata["mod_date"],
+                                            '%Y-%m-%d %H:%M:%S')
+        # Estimate of what the item writes in the ZODB
+        res['_size'] = len(res["text"]) + len(res["title"])
+        if image:
+            res['_image'] = image
+            res['_size'] += os.path.getsize(image["file"])
+        return res
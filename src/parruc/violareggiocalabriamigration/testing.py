@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+import json
+import os
+
 from plone.app.contenttypes.testing import PLONE_APP_CONTENTTYPES_FIXTURE
 from plone.app.robotframework.testing import REMOTE_LIBRARY_BUNDLE_FIXTURE
 from plone.app.testing import applyProfile
@@ -6,9 +9,36 @@ from plone.app.testing import FunctionalTesting
 from plone.app.testing import IntegrationTesting
 from plone.app.testing import PloneSandboxLayer
 from plone.testing import z2
+from zope.annotation.interfaces import IAttributeAnnotatable
+from zope.interface import implements
 
 import parruc.violareggiocalabriamigration
 
+# Benchmarks are slow, run them with bin/test --all or -a 10
+BENCHMARK_TEST_LEVEL = 10
+
+
+class FakeTransmogrifier(object):
+    """What the sections need of the transmogrifier, to test them alone"""
+    implements(IAttributeAnnotatable)
+
+    def __init__(self, context):
+        self.context = context
+
+
+def write_export_item(directory, item_id, count, file_name=None, **fields):
+    """Writes the json file of an item like the exporter does, in
+    directory. fields replace the defaults of a News Item without images
+    """
+    metadata = {"id": item_id, "count": count, "title": item_id,
+                "text": u"", "category": [], "featured": False,
+                "pub_date": "2015-01-01 10:00:00",
+                "mod_date": "2016-02-02 11:00:00", "images": []}
+    metadata.update(fields)
+    with open(os.path.join(directory, file_name or item_id + ".json"),
+              "w") as item_file:
+        json.dump(metadata, item_file)
+
 
 class ParrucViolareggiocalabriamigrationLayer(PloneSandboxLayer):
 
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Items per second of the whole import pipeline on synthetic exports of
+1k, 10k and 50k items with their images on disk, with the commits and
+catalog time it took and how much the ZODB cache grew.
+"""
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from collective.transmogrifier.transmogrifier import Transmogrifier
+from parruc.violareggiocalabriamigration.bulkreindex import \
+    BulkReindexSection
+from parruc.violareggiocalabriamigration.commit import CommitSection
+from parruc.violareggiocalabriamigration.testing import \
+    BENCHMARK_TEST_LEVEL
+from parruc.violareggiocalabriamigration.testing import \
+    PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING  # noqa
+from parruc.violareggiocalabriamigration.testing import \
+    write_export_item
+from plone import api
+
+PIPELINE = u'parruc.violareggiocalabriamigration.import'
+
+# 1x1 transparent gif
+GIF = ("GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04"
+       "\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D"
+       "\x01\x00;")
+
+TEXT = u"<p>La Viola vince &amp; festeggia. %s</p>" % (u"Lorem ipsum " * 50)
+
+
+def write_export(directory, items):
+    """An export of items json files like the exporter writes, with the
+    image of every item saved in the blobs folder
+    """
+    os.makedirs(os.path.join(directory, "blobs"))
+    for index in range(items):
+        blob = "blobs/%d.gif" % index
+        with open(os.path.join(directory, blob), "wb") as blob_file:
+            blob_file.write(GIF)
+        write_export_item(
+            directory, u"articolo-%d" % index, index,
+            file_name="%06d.json" % index,
+            title=u"Articolo %d &amp; <b>Viola</b>" % index, text=TEXT,
+            category=[u"categoria-%d" % (index % 5)], featured=index % 2,
+            images=[{"src": "http://localhost/images/%d.gif" % index,
+                     "blob": blob}])
+
+
+class BenchmarkImport(unittest.TestCase):
+
+    layer = PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING
+    level = BENCHMARK_TEST_LEVEL
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        self.directory = tempfile.mkdtemp()
+        self.db = self.portal._p_jar.db()
+        self.stats = {'commits': 0, 'catalog_seconds': 0.0,
+                      'cache_peak': self.db.cacheSize()}
+        self.commit = CommitSection.commit
+        self.flush = BulkReindexSection.flush
+        stats, db, commit, flush = self.stats, self.db, self.commit, \
+            self.flush
+
+        def counted_commit(section, *args):
+            commit(section, *args)
+            stats['commits'] += 1
+            stats['cache_peak'] = max(stats['cache_peak'], db.cacheSize())
+
+        def timed_flush(section):
+            start = time.time()
+            flush(section)
+            stats['catalog_seconds'] += time.time() - start
+
+        CommitSection.commit = counted_commit
+        BulkReindexSection.flush = timed_flush
+
+    def tearDown(self):
+        CommitSection.commit = self.commit
+        BulkReindexSection.flush = self.flush
+        shutil.rmtree(self.directory)
+
+    def run_import(self, items):
+        write_export(os.path.join(self.directory, "export"), items)
+        cache_size = self.db.cacheSize()
+        transmogrifier = Transmogrifier(self.portal)
+        start = time.time()
+        with api.env.adopt_roles(['Manager']):
+            transmogrifier(
+                PIPELINE,
+                source={'directory': os.path.join(self.directory, "export"),
+                        'start': '0', 'batch': '0'},
+                commit={'savepoint': 'true'})
+        seconds = time.time() - start
+        print("\n%6d items: %8.1f items/sec, %d savepoints, catalog %.1fs, "
+              "ZODB cache %d -> %d objects (peak %d)" % (
+                  items, items / seconds, self.stats['commits'],
+                  self.stats['catalog_seconds'], cache_size,
+                  self.db.cacheSize(), self.stats['cache_peak']))
+        self.assertEqual(len(self.portal['news'].objectIds()), items)
+
+    def test_1k(self):
+        self.run_import(1000)
+
+    def test_10k(self):
+        self.run_import(10000)
+
+    def test_50k(self):
+        self.run_import(50000)
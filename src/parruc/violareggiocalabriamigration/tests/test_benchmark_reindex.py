@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Items per second of the reindexing of the import pipeline, the
+plone.app.transmogrifier section against the bulkreindex one.
+"""
+from __future__ import print_function
+
+import time
+import unittest
+
+from parruc.violareggiocalabriamigration.bulkreindex import \
+    BulkReindexSection
+from parruc.violareggiocalabriamigration.testing import \
+    BENCHMARK_TEST_LEVEL
+from parruc.violareggiocalabriamigration.testing import \
+    FakeTransmogrifier
+from parruc.violareggiocalabriamigration.testing import \
+    PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING  # noqa
+from plone import api
+from plone.app.transmogrifier.reindexobject import ReindexObjectSection
+
+ITEMS = 500
+
+
+class BenchmarkReindex(unittest.TestCase):
+
+    layer = PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING
+    level = BENCHMARK_TEST_LEVEL
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        with api.env.adopt_roles(['Manager']):
+            news = api.content.create(container=self.portal, type='Folder',
+                                      id='news')
+            for index in range(ITEMS):
+                api.content.create(container=news, type='News Item',
+                                   id='item-%d' % index)
+        self.paths = [u'/news'] + [u'/news/item-%d' % index
+                                   for index in range(ITEMS)]
+
+    def run_section(self, section_class):
+        # What the previous sections do: change every object
+        for path in self.paths[1:]:
+            self.portal.unrestrictedTraverse(path.lstrip('/')).title = path
+        items = iter([{'_path': path} for path in self.paths])
+        section = section_class(FakeTransmogrifier(self.portal), 'reindex',
+                                {}, items)
+        start = time.time()
+        count = len(list(section))
+        return count / (time.time() - start)
+
+    def test_benchmark(self):
+        before = self.run_section(ReindexObjectSection)
+        after = self.run_section(BulkReindexSection)
+        print("\nreindexobject %.1f items/sec, bulkreindex %.1f items/sec"
+              % (before, after))
+        catalog = api.portal.get_tool('portal_catalog')
+        self.assertEqual(len(catalog(Title='/news/item-0')), 1)
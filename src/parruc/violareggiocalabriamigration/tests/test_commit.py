@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import time
+import unittest
+
+import transaction
+
+from parruc.violareggiocalabriamigration.commit import CommitSection
+from parruc.violareggiocalabriamigration.commit import get_cursor
+from parruc.violareggiocalabriamigration.commit import set_cursor
+from parruc.violareggiocalabriamigration.testing import \
+    FakeTransmogrifier
+from parruc.violareggiocalabriamigration.testing import \
+    PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING  # noqa
+
+MB = 2 ** 20
+
+
+class TestCommit(unittest.TestCase):
+
+    layer = PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        # Count the savepoints and the cache minimizations of the section
+        self.savepoints = 0
+        self.minimized = 0
+        self.savepoint = transaction.savepoint
+        jar = self.portal._p_jar
+        cache_minimize = jar.cacheMinimize
+
+        def savepoint(optimistic=False):
+            self.savepoints += 1
+            return self.savepoint(optimistic)
+
+        def counted_cache_minimize():
+            self.minimized += 1
+            cache_minimize()
+
+        transaction.savepoint = savepoint
+        jar.cacheMinimize = counted_cache_minimize
+
+    def tearDown(self):
+        transaction.savepoint = self.savepoint
+        del self.portal._p_jar.cacheMinimize
+
+    def run_section(self, items, **options):
+        options.setdefault('savepoint', 'true')
+        options.setdefault('every', '0')
+        options.setdefault('seconds', '0')
+        options.setdefault('megabytes', '0')
+        section = CommitSection(FakeTransmogrifier(self.portal), 'commit',
+                                options, iter(items))
+        return list(section)
+
+    def items(self, count, size=0):
+        return [{'_path': u'/news/%d' % position, '_position': position,
+                 '_size': size} for position in range(count)]
+
+    def test_cursor_left_to_the_source(self):
+        set_cursor(self.portal, 3)
+        items = [{'_path': u'/news'}] + self.items(5)
+        self.assertEqual(self.run_section(items, every='2'), items)
+        self.assertEqual(get_cursor(self.portal), 3)
+
+    def test_cursor_reset(self):
+        set_cursor(self.portal, 3)
+        set_cursor(self.portal, 0)
+        self.assertEqual(get_cursor(self.portal), 0)
+
+    def test_only_at_the_end(self):
+        items = self.items(5, MB)
+        self.assertEqual(self.run_section(items), items)
+        self.assertEqual(self.savepoints, 1)
+        self.assertEqual(self.minimized, 1)
+
+    def test_items_threshold(self):
+        # The folder has no position and does not count
+        items = [{'_path': u'/news'}] + self.items(5)
+        self.run_section(items, every='2')
+        # After the second and the fourth item, and at the end
+        self.assertEqual(self.savepoints, 3)
+        self.assertEqual(self.minimized, 3)
+
+    def test_size_threshold(self):
+        items = self.items(5, MB // 2)
+        self.assertEqual(self.run_section(items, megabytes='1'), items)
+        self.assertEqual(self.savepoints, 3)
+        self.assertEqual(self.minimized, 3)
+
+    def test_time_threshold(self):
+        def slow_items():
+            for item in self.items(3):
+                time.sleep(0.02)
+                yield item
+        self.run_section(slow_items(), seconds='0.01')
+        # After every item and at the end
+        self.assertEqual(self.savepoints, 4)
+        self.assertEqual(self.minimized, 4)
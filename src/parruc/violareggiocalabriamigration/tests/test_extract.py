@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from parruc.violareggiocalabriamigration.scripts.extract import extract_bs4
+from parruc.violareggiocalabriamigration.scripts.extract import \
+    extract_lxml
+from parruc.violareggiocalabriamigration.scripts.extract import HAS_LXML
+
+PAGE = (b'<html><head>%s<title>Viola</title></head><body>'
+        b'<div class="menu"><p>Menu</p><a href="/menu">Menu</a></div>'
+        b'<div class="item-page">%s</div>'
+        b'<div class="footer"><p>Footer</p></div></body></html>')
+
+CORPUS = [
+    (b'', b'<h2>Titolo</h2><p>Uno</p><p>Due <b>grassetto</b><br>fine</p>'),
+    (b'', b'<h1> Titolo </h1><p><img src="/a.jpg" alt="A"/>'
+          b'<a href="/news/1">uno</a> <a name="x">ancora</a></p><p></p>'),
+    (b'', b'<p>a<div>b</div>c</p>'),
+    (b'', b'<p>uno<p>due'),
+    (b'', b'<p>lista<ul><li>uno</li></ul></p><p>dopo</p>'),
+    (b'', b'<p>commento<!-- nascosto --> e <script>x = 1</script></p>'),
+    (b'<meta charset="utf-8">', u'<p>Città & perché</p>'.encode('utf-8')),
+    (b'<meta http-equiv="Content-Type" '
+     b'content="text/html; charset=iso-8859-1">',
+     b'<p>caff\xe8 \x93tra virgolette\x94</p>'),
+    (b'', b'<p>cp1252 senza dichiarazione \x93ok\x94 \xe8</p>'),
+    (b'', b'<p>&egrave; &amp; &nbsp;&#8217;</p><h2>Secondo</h2>'),
+]
+
+
+@unittest.skipUnless(HAS_LXML, "lxml is not installed")
+class TestExtract(unittest.TestCase):
+
+    def test_same_output(self):
+        for head, article in CORPUS:
+            page = PAGE % (head, article)
+            self.assertEqual(extract_lxml(page), extract_bs4(page), article)
+
+    def test_no_article(self):
+        page = b'<html><body><p>Nessun articolo</p></body></html>'
+        self.assertIsNone(extract_bs4(page))
+        self.assertIsNone(extract_lxml(page))
+        self.assertIsNone(extract_lxml(b''))
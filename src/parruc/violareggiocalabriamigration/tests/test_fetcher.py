@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Tests for the exporter HTTP layer against a local faulty server."""
+from BaseHTTPServer import BaseHTTPRequestHandler
+from BaseHTTPServer import HTTPServer
+from collections import defaultdict
+from parruc.violareggiocalabriamigration.scripts.fetcher import AdaptiveLimiter
+from parruc.violareggiocalabriamigration.scripts.fetcher import Fetcher
+from SocketServer import ThreadingMixIn
+
+import requests
+import threading
+import time
+import unittest
+
+
+class FaultyHandler(BaseHTTPRequestHandler):
+    """/fail/<n>/<key> answers 503 the first n times, /slow/<seconds>
+    sleeps before answering, /missing is a 404
+    """
+
+    hits = defaultdict(int)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        self.hits[self.path] += 1
+        if parts[0] == "fail" and self.hits[self.path] <= int(parts[1]):
+            self.send_response(503)
+            self.end_headers()
+            return
+        if parts[0] == "slow":
+            time.sleep(float(parts[1]))
+        if parts[0] == "missing":
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write("ok")
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TestFetcher(unittest.TestCase):
+
+    def setUp(self):
+        FaultyHandler.hits.clear()
+        self.server = ThreadingServer(("127.0.0.1", 0), FaultyHandler)
+        self.base = "http://127.0.0.1:%d" % self.server.server_address[1]
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.limiter = AdaptiveLimiter(4, latency_target=0.5)
+        self.fetcher = Fetcher(requests.Session(), self.limiter,
+                               timeout=0.2, retries=2, backoff=0.01)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_transient_errors_are_retried(self):
+        req = self.fetcher.get(self.base + "/fail/2/a")
+        self.assertEqual(req.status_code, 200)
+        report = self.fetcher.report()
+        self.assertEqual(report["requests"], 3)
+        self.assertEqual(report["retries"], 2)
+        self.assertEqual(report["errors"], 0)
+
+    def test_retries_are_bounded(self):
+        req = self.fetcher.get(self.base + "/fail/5/b")
+        self.assertEqual(req.status_code, 503)
+        self.assertEqual(FaultyHandler.hits["/fail/5/b"], 3)
+        self.assertEqual(self.fetcher.report()["errors"], 1)
+
+    def test_timeouts_are_retried_then_raised(self):
+        self.assertRaises(requests.Timeout,
+                          self.fetcher.get, self.base + "/slow/1")
+        self.assertEqual(self.fetcher.report()["requests"], 3)
+
+    def test_client_errors_are_not_retried(self):
+        req = self.fetcher.get(self.base + "/missing")
+        self.assertEqual(req.status_code, 404)
+        self.assertEqual(FaultyHandler.hits["/missing"], 1)
+
+    def test_failures_halve_the_concurrency(self):
+        self.fetcher.get(self.base + "/fail/1/c")
+        self.assertEqual(self.limiter.lowest, 2)
+        for i in range(10):
+            self.fetcher.get(self.base + "/ok")
+        self.assertEqual(self.limiter.limit, 4)
+
+    def test_concurrency_never_exceeds_the_limit(self):
+        limiter = AdaptiveLimiter(2)
+        peak = []
+        original_acquire = limiter.acquire
+
+        def acquire():
+            original_acquire()
+            peak.append(limiter.active)
+        limiter.acquire = acquire
+        fetcher = Fetcher(requests.Session(), limiter, timeout=5)
+        threads = [threading.Thread(target=fetcher.get,
+                                    args=(self.base + "/slow/0.05",))
+                   for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(peak), 2)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+
+import time
+import unittest
+
+from parruc.violareggiocalabriamigration.htmltotext import html_to_text
+from parruc.violareggiocalabriamigration.htmltotext import \
+    HtmlToTextSection
+from parruc.violareggiocalabriamigration.testing import \
+    BENCHMARK_TEST_LEVEL
+from parruc.violareggiocalabriamigration.testing import \
+    PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING  # noqa
+from plone import api
+
+CORPUS = [
+    u"Plain title",
+    u"Città &amp; <b>Reggina</b>",
+    u"<p>Paragraph</p><br/>and a break",
+    u"&egrave; &#232; &nbsp;&unknown; &#65;",
+    u"<strong>Forza</strong> Viola! <em>87-80</em>",
+    u"<script a>alert()</script> after the script",
+    u"<i>Italic</i><img src='a.jpg'>",
+    u"a < b > c",
+    u"&quot;Vittoria&quot; 87&ndash;80",
+    u"<FONT color=red>Rosso</FONT>",
+    u"<bold>Not bold</bold> <b>",
+    u"€ perché ñ",
+]
+
+
+def portal_transforms(value):
+    """What encode, portaltransforms and decode gave"""
+    transforms = api.portal.get_tool('portal_transforms')
+    data = transforms.convertToData(
+        'text/plain', value.encode('utf-8'), mimetype='text/html')
+    return data.decode('utf-8')
+
+
+class TestHtmlToText(unittest.TestCase):
+    """The section must give what encode, portaltransforms and decode
+    gave
+    """
+
+    layer = PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING
+
+    def test_same_as_portal_transforms(self):
+        for value in CORPUS:
+            self.assertEqual(html_to_text(value), portal_transforms(value))
+
+    def test_section(self):
+        items = [{'title': u'<b>Forza</b> Viola', 'text': u'<p>x</p>'},
+                 {'_path': u'/news'}]
+        section = HtmlToTextSection(None, 'htmltotext', {'keys': 'title'},
+                                    iter(items))
+        self.assertEqual(list(section), [
+            {'title': u'Forza Viola', 'text': u'<p>x</p>'},
+            {'_path': u'/news'}])
+
+
+class BenchmarkHtmlToText(unittest.TestCase):
+
+    layer = PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING
+    level = BENCHMARK_TEST_LEVEL
+
+    def test_timing(self):
+        values = CORPUS * 100
+        start = time.time()
+        for value in values:
+            portal_transforms(value)
+        before = time.time() - start
+        start = time.time()
+        section = HtmlToTextSection(None, 'htmltotext', {'keys': 'title'},
+                                    iter({'title': value}
+                                         for value in values))
+        list(section)
+        after = time.time() - start
+        print("\nportal_transforms %.3fs, htmltotext %.3fs for %d titles"
+              % (before, after, len(values)))
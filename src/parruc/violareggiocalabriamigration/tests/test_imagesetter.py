@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+
+from parruc.violareggiocalabriamigration.imagesetter import \
+    ImageSetterSection
+from parruc.violareggiocalabriamigration.testing import \
+    FakeTransmogrifier
+from parruc.violareggiocalabriamigration.testing import \
+    PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING  # noqa
+from plone import api
+
+# 1x1 transparent gif
+GIF = ("GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04"
+       "\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D"
+       "\x01\x00;")
+
+
+class TestImageSetter(unittest.TestCase):
+
+    layer = PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        with api.env.adopt_roles(['Manager']):
+            api.content.create(container=self.portal, type='News Item',
+                               id='news-item')
+        image_file, self.path = tempfile.mkstemp()
+        os.write(image_file, GIF)
+        os.close(image_file)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def run_section(self, items):
+        section = ImageSetterSection(FakeTransmogrifier(self.portal),
+                                     'imagesetter', {}, iter(items))
+        return list(section)
+
+    def test_image_set_from_file(self):
+        items = self.run_section([{
+            '_path': u'/news-item',
+            '_image': {'file': self.path, 'filename': u'pixel.gif'}}])
+        self.assertEqual(items, [{'_path': u'/news-item'}])
+        image = self.portal['news-item'].image
+        self.assertEqual(image.filename, u'pixel.gif')
+        self.assertEqual(image.data, GIF)
+        self.assertEqual(image.getImageSize(), (1, 1))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_missing_object(self):
+        items = self.run_section([{
+            '_path': u'/missing',
+            '_image': {'file': self.path, 'filename': u'pixel.gif'}}])
+        self.assertEqual(items, [{'_path': u'/missing'}])
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_items_without_image(self):
+        items = [{'_path': u'/news-item'}, {'_type': u'Folder'}]
+        self.assertEqual(self.run_section(items), items)
+        self.assertIsNone(self.portal['news-item'].image)
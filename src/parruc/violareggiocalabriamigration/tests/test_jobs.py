@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+import json
+import shutil
+import tempfile
+import unittest
+
+from zope.annotation.interfaces import IAnnotations
+
+from parruc.violareggiocalabriamigration.commit import CommitSection
+from parruc.violareggiocalabriamigration.commit import set_cursor
+from parruc.violareggiocalabriamigration.jobs import ImportJob
+from parruc.violareggiocalabriamigration.jobs import JOBS
+from parruc.violareggiocalabriamigration.skipunchanged import \
+    SkipUnchangedSection
+from parruc.violareggiocalabriamigration.skipunchanged import STATS_KEY
+from parruc.violareggiocalabriamigration.source import END_KEY
+from parruc.violareggiocalabriamigration.source import Source
+from parruc.violareggiocalabriamigration.source import START_INDEX_KEY
+from parruc.violareggiocalabriamigration.source import STOP_INDEX_KEY
+from parruc.violareggiocalabriamigration.source import TOTAL_KEY
+from parruc.violareggiocalabriamigration.testing import \
+    FakeTransmogrifier
+from parruc.violareggiocalabriamigration.testing import \
+    PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING  # noqa
+from parruc.violareggiocalabriamigration.testing import \
+    write_export_item
+from plone import api
+from plone.app.testing import setRoles
+from plone.app.testing import TEST_USER_ID
+
+
+class StubJob(ImportJob):
+    """Runs in the test thread, on the test site, with scripted chunks:
+    (cursor after the chunk, index after the chunk, end of the export)
+    or an exception. The export has 10 items
+    """
+
+    def __init__(self, site, chunks, **kwargs):
+        super(StubJob, self).__init__(site, u'pipeline', **kwargs)
+        self.site = site
+        self.scripted = list(chunks)
+        self.scripted_index = 0
+
+    def open_site(self, connection):
+        return self.site
+
+    def close_site(self):
+        pass
+
+    def run_chunk(self, site):
+        chunk = self.scripted.pop(0)
+        if isinstance(chunk, Exception):
+            raise chunk
+        cursor, index, end = chunk
+        set_cursor(site, cursor)
+        annotations = {
+            STATS_KEY: {"new": 1, "changed": 0, "unchanged": 2},
+            TOTAL_KEY: 10, END_KEY: end,
+            START_INDEX_KEY: self.scripted_index, STOP_INDEX_KEY: index}
+        self.scripted_index = index
+        return self.chunk_done(annotations)
+
+
+class TestImportJob(unittest.TestCase):
+
+    layer = PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+
+    def test_status(self):
+        job = StubJob(self.portal, [], start=20)
+        job.started = 100.0
+        self.assertEqual(job.status(20)['done'], 0)
+
+        # Counts are not dense: the cursor goes past the number of items
+        job.first_index, job.index, job.total = 10, 30, 80
+        job.position = 50
+        status = job.status(104)
+        self.assertEqual(status['state'], 'running')
+        self.assertEqual(status['position'], 104)
+        self.assertEqual(status['done'], 20)
+
+        job.state = 'done'
+        job.finished = 110.0
+        job.index = 60
+        status = job.status(0)
+        self.assertEqual(status['position'], 50)
+        self.assertEqual(status['done'], 50)
+        self.assertEqual(status['elapsed_seconds'], 10.0)
+        self.assertEqual(status['items_per_second'], 5.0)
+        self.assertEqual(status['eta_seconds'], 4.0)
+
+    def test_done(self):
+        job = StubJob(self.portal, [(7, 4, False), (15, 8, False),
+                                    (0, 10, True)], batch=4, start=0)
+        job.run()
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(job.chunks, 3)
+        self.assertEqual(job.position, 0)
+        self.assertEqual(job.status()['done'], 10)
+        self.assertEqual(job.counts,
+                         {"new": 3, "changed": 0, "unchanged": 6})
+        self.assertIsNotNone(job.finished)
+
+    def test_cancelled(self):
+        job = StubJob(self.portal, [(7, 4, False), (15, 8, False),
+                                    (0, 10, True)], batch=4, start=0)
+        run_chunk = job.run_chunk
+
+        def cancel_after(site):
+            job.cancel()
+            return run_chunk(site)
+        job.run_chunk = cancel_after
+        job.run()
+        self.assertEqual(job.state, 'cancelled')
+        self.assertEqual(job.chunks, 1)
+        self.assertEqual(job.position, 7)
+        self.assertEqual(job.status()['done'], 4)
+
+    def test_error(self):
+        job = StubJob(self.portal, [(7, 4, False), ValueError('rotto')],
+                      batch=4, start=0)
+        job.run()
+        self.assertEqual(job.state, 'error')
+        self.assertEqual(job.position, 7)
+        self.assertEqual(len(job.errors), 1)
+        self.assertIn('rotto', job.errors[0]['error'])
+
+    def test_stuck(self):
+        job = StubJob(self.portal, [(0, 0, False)], batch=4, start=0)
+        job.run()
+        self.assertEqual(job.state, 'error')
+        self.assertIn('stuck', job.errors[0]['error'])
+
+
+class ChunkJob(StubJob):
+    """Imports the chunks through the source, skipunchanged and commit
+    sections
+    """
+
+    def __init__(self, site, directory, **kwargs):
+        super(ChunkJob, self).__init__(site, [], **kwargs)
+        self.directory = directory
+
+    def run_chunk(self, site):
+        options = {'directory': self.directory, 'batch': str(self.batch)}
+        if self.start is not None:
+            options['start'] = str(self.start)
+            self.start = None
+        transmogrifier = FakeTransmogrifier(site)
+        source = Source(transmogrifier, 'source', options, iter([]))
+        skip = SkipUnchangedSection(transmogrifier, 'skipunchanged', {},
+                                    source)
+        for item in CommitSection(transmogrifier, 'commit',
+                                  {'savepoint': 'true'}, skip):
+            pass
+        return self.chunk_done(IAnnotations(transmogrifier))
+
+
+class TestUnchangedChunks(unittest.TestCase):
+
+    layer = PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        self.directory = tempfile.mkdtemp()
+        with api.env.adopt_roles(['Manager']):
+            news = api.content.create(container=self.portal, type='Folder',
+                                      id='news')
+            for count in range(5):
+                item_id = u'notizia-%d' % count
+                api.content.create(container=news, type='News Item',
+                                   id=item_id)
+                write_export_item(self.directory, item_id, count)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_unchanged_chunks(self):
+        ChunkJob(self.portal, self.directory, batch=0, start=0).run()
+        # Only the last item changed since the first import
+        write_export_item(self.directory, u'notizia-4', 4, text=u"cambiato")
+
+        job = ChunkJob(self.portal, self.directory, batch=2, start=0)
+        job.run()
+        self.assertEqual(job.errors, [])
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(job.chunks, 3)
+        self.assertEqual(job.status()['done'], 5)
+        self.assertEqual(job.counts,
+                         {"new": 0, "changed": 1, "unchanged": 4})
+
+
+class TestImportViews(unittest.TestCase):
+
+    layer = PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        self.job = JOBS[self.portal.getPhysicalPath()] = StubJob(
+            self.portal, [], start=0)
+
+    def tearDown(self):
+        JOBS.pop(self.portal.getPhysicalPath(), None)
+
+    def test_status(self):
+        view = self.portal.restrictedTraverse(
+            'violareggiocalabriaimport-status')
+        status = json.loads(view())
+        self.assertEqual(status['state'], 'running')
+        self.assertEqual(status['position'], 0)
+        self.assertFalse(status['cancelled'])
+
+    def test_cancel(self):
+        view = self.portal.restrictedTraverse(
+            'violareggiocalabriaimport-cancel')
+        status = json.loads(view())
+        self.assertTrue(status['cancelled'])
+        self.assertTrue(self.job.cancelled)
+
+    def test_no_job(self):
+        JOBS.pop(self.portal.getPhysicalPath())
+        view = self.portal.restrictedTraverse(
+            'violareggiocalabriaimport-status')
+        self.assertEqual(json.loads(view()), {'state': 'none'})
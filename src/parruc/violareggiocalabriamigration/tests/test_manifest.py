@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from parruc.violareggiocalabriamigration.scripts.manifest import Manifest
+
+BASE_URL = "http://www.violareggiocalabria.it"
+
+
+def entry(count):
+    return {"count": count, "id": u"notizia-%d" % count,
+            "file": u"notizia-%d.json" % count, "mod_date": "",
+            "hash": "", "final_url": BASE_URL + "/news/%d" % count}
+
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.export_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.export_path)
+
+    def update(self, manifest, *counts):
+        for count in counts:
+            manifest.update(BASE_URL + "/?id=%d" % count, **entry(count))
+
+    def test_killed_before_save(self):
+        manifest = Manifest(self.export_path, save_every=2)
+        self.update(manifest, 0, 1, 2)
+        # Killed: the third entry is only in the journal
+        manifest.journal.close()
+        manifest = Manifest(self.export_path)
+        self.assertEqual(manifest.next_count(), 3)
+        self.assertEqual(manifest.get(BASE_URL + "/?id=2"), entry(2))
+
+    def test_truncated_journal(self):
+        manifest = Manifest(self.export_path, save_every=10)
+        self.update(manifest, 0, 1)
+        manifest.journal.write('["violareggiocalabria.it/?id=2", {"cou')
+        manifest.journal.close()
+        manifest = Manifest(self.export_path)
+        self.assertEqual(manifest.next_count(), 2)
+        self.update(manifest, 2)
+        manifest.journal.close()
+        self.assertEqual(Manifest(self.export_path).next_count(), 3)
+
+    def test_save_empties_the_journal(self):
+        manifest = Manifest(self.export_path)
+        self.update(manifest, 0, 1)
+        manifest.save()
+        self.assertFalse(os.path.exists(manifest.journal_path))
+        self.assertEqual(len(Manifest(self.export_path).entries), 2)
+
+    def test_stale_journal(self):
+        manifest = Manifest(self.export_path)
+        self.update(manifest, 0, 1)
+        manifest.journal.close()
+        # A new export does not continue the killed one
+        manifest = Manifest(self.export_path, load=False)
+        self.update(manifest, 5)
+        manifest.journal.close()
+        manifest = Manifest(self.export_path)
+        self.assertEqual(len(manifest.entries), 1)
+        self.assertEqual(manifest.get(BASE_URL + "/?id=5"), entry(5))
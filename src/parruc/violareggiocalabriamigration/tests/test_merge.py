@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from parruc.violareggiocalabriamigration.scripts.merge import iter_export
+from parruc.violareggiocalabriamigration.scripts.merge import merge_exports
+from parruc.violareggiocalabriamigration.scripts.standin import \
+    StandinServer
+from parruc.violareggiocalabriamigration.scripts.standin import write_dump
+
+
+def item(position, url, item_id, title):
+    return {"id": item_id, "title": title, "url": url, "count": 0,
+            "position": position, "text": u"", "images": [],
+            "category": u"1", "featured": False, "hits": u"0",
+            "pub_date": u"2015-01-01 10:00:00",
+            "mod_date": u"2016-02-02 11:00:00"}
+
+
+def run_exporter(*args):
+    args = [sys.executable, "-m",
+            "parruc.violareggiocalabriamigration.scripts.export_news"] + \
+        list(args)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.check_output(args, env=env, stderr=subprocess.STDOUT)
+
+
+class TestMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def write_shard(self, name, items):
+        shard_path = os.path.join(self.path, name)
+        os.makedirs(shard_path)
+        for index, data in enumerate(items):
+            data["count"] = index
+            with open(os.path.join(shard_path, "%d.json" % index),
+                      "w") as item_file:
+                json.dump(data, item_file)
+        return shard_path
+
+    def merged(self, export_path):
+        return sorted((data for locator, data in iter_export(export_path)),
+                      key=lambda data: data["count"])
+
+    def test_dedup_and_renumber(self):
+        shards = [
+            self.write_shard("0", [
+                item(0, u"http://www.violareggiocalabria.it/a/", u"notizia",
+                     u"Notizia"),
+                item(3, u"http://www.violareggiocalabria.it/c", u"terza",
+                     u"Terza")]),
+            self.write_shard("1", [
+                item(1, u"http://www.violareggiocalabria.it/b", u"notizia",
+                     u"Notizia"),
+                item(2, u"http://violareggiocalabria.it/a", u"doppia",
+                     u"Doppia")])]
+        export_path = os.path.join(self.path, "merged")
+        os.makedirs(export_path)
+        merge_exports(export_path, shards, "files", 1000)
+        merged = self.merged(export_path)
+        self.assertEqual([data["count"] for data in merged], [0, 1, 2])
+        self.assertEqual([data["id"] for data in merged],
+                         [u"notizia", u"notizia-1", u"terza"])
+        self.assertTrue(os.path.exists(
+            os.path.join(export_path, "notizia-1.json")))
+
+    def test_same_as_single_export(self):
+        server = StandinServer(articles=30).start()
+        try:
+            input_path = os.path.join(self.path, "dump")
+            write_dump(input_path, server.base_url, 30, redirect_every=4)
+            common = ["--input", input_path, "--base-url", server.base_url,
+                      "--skip-images", "--cache-size", "0", "-w", "2"]
+            single = os.path.join(self.path, "single")
+            run_exporter("-p", single, *common)
+            shards = []
+            for index in range(3):
+                shards.append(os.path.join(self.path, "shard-%d" % index))
+                run_exporter("-p", shards[-1], "--shard", "%d/3" % index,
+                             *common)
+        finally:
+            server.stop()
+        export_path = os.path.join(self.path, "merged")
+        os.makedirs(export_path)
+        merge_exports(export_path, shards, "packed", 10)
+        merged = self.merged(export_path)
+        for data in merged:
+            del data["position"]
+        self.assertEqual(merged, self.merged(single))
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from parruc.violareggiocalabriamigration.packed import is_packed
+from parruc.violareggiocalabriamigration.packed import PackedReader
+from parruc.violareggiocalabriamigration.packed import PackedWriter
+from parruc.violareggiocalabriamigration.packed import shard_names
+
+
+class TestPacked(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def read(self):
+        reader = PackedReader(self.path)
+        try:
+            return dict((item_id, reader.get(item_id))
+                        for item_id in reader.ids())
+        finally:
+            reader.close()
+
+    def test_shards(self):
+        writer = PackedWriter(self.path, shard_size=2)
+        for index in range(5):
+            writer.write({"id": u"item-%d" % index, "count": index})
+        writer.close()
+        self.assertTrue(is_packed(self.path))
+        self.assertEqual(len(shard_names(self.path)), 3)
+        items = self.read()
+        self.assertEqual(sorted(items), [u"item-%d" % index
+                                         for index in range(5)])
+        self.assertEqual(items[u"item-3"]["count"], 3)
+
+    def test_unique_id(self):
+        writer = PackedWriter(self.path)
+        self.assertEqual(writer.write({"id": u"notizia", "count": 0}),
+                         u"notizia")
+        self.assertEqual(writer.write({"id": u"notizia", "count": 1}),
+                         u"notizia-1")
+        self.assertEqual(writer.write({"id": u"notizia", "count": 2}),
+                         u"notizia-2")
+        writer.close()
+        items = self.read()
+        self.assertEqual(items[u"notizia"]["count"], 0)
+        self.assertEqual(items[u"notizia-2"]["count"], 2)
+
+    def test_replace_on_rebuild(self):
+        writer = PackedWriter(self.path)
+        writer.write({"id": u"notizia", "count": 0, "text": u"vecchio"})
+        writer.write({"id": u"notizia", "count": 0, "text": u"nuovo"},
+                     replace=True)
+        # Killed before saving the index
+        writer.file.close()
+        writer = PackedWriter(self.path, append=True)
+        writer.close()
+        items = self.read()
+        self.assertEqual(list(items), [u"notizia"])
+        self.assertEqual(items[u"notizia"]["text"], u"nuovo")
+
+    def test_rebuild_truncated(self):
+        writer = PackedWriter(self.path)
+        writer.write({"id": u"uno", "count": 0})
+        writer.write({"id": u"due", "count": 1})
+        writer.close()
+        shard_path = os.path.join(self.path, shard_names(self.path)[0])
+        size = os.path.getsize(shard_path)
+        with open(shard_path, "ab") as shard_file:
+            shard_file.write(b'{"id": "tre", "cou')
+        writer = PackedWriter(self.path, append=True)
+        self.assertEqual(os.path.getsize(shard_path), size)
+        writer.write({"id": u"tre", "count": 2})
+        writer.close()
+        items = self.read()
+        self.assertEqual(sorted(items), [u"due", u"tre", u"uno"])
+        self.assertEqual(items[u"tre"]["count"], 2)
+
+    def test_overwrite(self):
+        writer = PackedWriter(self.path)
+        writer.write({"id": u"uno", "count": 0})
+        writer.close()
+        writer = PackedWriter(self.path)
+        writer.write({"id": u"due", "count": 0})
+        writer.close()
+        self.assertEqual(list(self.read()), [u"due"])
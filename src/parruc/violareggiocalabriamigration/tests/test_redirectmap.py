@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+
+from zope.component import getUtility
+
+from parruc.violareggiocalabriamigration.browser.redirects import \
+    source_directory
+from parruc.violareggiocalabriamigration.scripts.manifest import Manifest
+from parruc.violareggiocalabriamigration.scripts.redirectmap import \
+    add_aliases
+from parruc.violareggiocalabriamigration.scripts.redirectmap import \
+    read_redirect_map
+from parruc.violareggiocalabriamigration.scripts.redirectmap import \
+    write_redirect_map
+from parruc.violareggiocalabriamigration.testing import \
+    PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING  # noqa
+from plone.app.redirector.interfaces import IRedirectionStorage
+from plone.app.testing import setRoles
+from plone.app.testing import TEST_USER_ID
+
+BASE_URL = "http://www.violareggiocalabria.it"
+
+
+class TestRedirectMap(unittest.TestCase):
+
+    def setUp(self):
+        self.export_path = tempfile.mkdtemp()
+        self.manifest = Manifest(self.export_path, load=False)
+        self.manifest.update(
+            BASE_URL + "/index.php?id=1", count=0, id=u"prima", file=None,
+            mod_date="", hash="", final_url=BASE_URL + "/news/prima.html")
+        self.manifest.update(
+            BASE_URL + "/index.php?id=2", count=1, id=u"seconda", file=None,
+            mod_date="", hash="", final_url=BASE_URL + "/index.php?id=2")
+
+    def tearDown(self):
+        shutil.rmtree(self.export_path)
+
+    def write_and_read(self):
+        write_redirect_map(self.export_path, self.manifest)
+        return read_redirect_map(
+            os.path.join(self.export_path, "redirects.map"))
+
+    def test_map(self):
+        self.assertEqual(self.write_and_read(), {
+            "/index.php?id=1": "/news/prima",
+            "/news/prima.html": "/news/prima",
+            "/index.php?id=2": "/news/seconda"})
+
+    def test_aliases(self):
+        add_aliases(self.manifest, {
+            BASE_URL + "/vecchia": BASE_URL + "/news/prima.html",
+            BASE_URL + "/persa": BASE_URL + "/altro"})
+        redirects = self.write_and_read()
+        self.assertEqual(redirects["/vecchia"], "/news/prima")
+        self.assertNotIn("/persa", redirects)
+
+
+class TestLoadRedirects(unittest.TestCase):
+
+    layer = PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        self.request = self.layer['request']
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        self.export_path = tempfile.mkdtemp()
+        self.path = os.path.join(self.export_path, "redirects.map")
+        with open(self.path, "w") as map_file:
+            map_file.write("/a\t/news/a\n/b\t/a\n/c\t/c\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.export_path)
+
+    def test_load(self):
+        self.request.form['path'] = self.path
+        view = self.portal.restrictedTraverse('violareggiocalabriaredirects')
+        self.assertIn('aggiunti: 2', view())
+        storage = getUtility(IRedirectionStorage)
+        root = '/'.join(self.portal.getPhysicalPath())
+        self.assertEqual(storage.get(root + '/b'), root + '/news/a')
+        self.assertIsNone(storage.get(root + '/c'))
+        self.assertIn('presenti: 2', view())
+
+    def test_directory(self):
+        self.request.form['directory'] = self.export_path
+        view = self.portal.restrictedTraverse('violareggiocalabriaredirects')
+        self.assertIn('aggiunti: 2', view())
+
+    def test_source_directory(self):
+        # The import pipeline takes it from the configuration it includes
+        self.assertEqual(
+            source_directory(u'parruc.violareggiocalabriamigration.import'),
+            '/var/plone/sites/exported')
+        view = self.portal.restrictedTraverse('violareggiocalabriaredirects')
+        self.assertEqual(view.map_path(),
+                         '/var/plone/sites/exported/redirects.map')
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+import transaction
+
+from parruc.violareggiocalabriamigration.redirects import RedirectsSection
+from parruc.violareggiocalabriamigration.redirects import resolve_redirects
+from parruc.violareggiocalabriamigration.testing import \
+    FakeTransmogrifier
+from parruc.violareggiocalabriamigration.testing import \
+    PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING  # noqa
+
+
+class TestResolveRedirects(unittest.TestCase):
+
+    def test_plain(self):
+        redirects = {'/a': '/news/a', '/b': '/news/b'}
+        self.assertEqual(resolve_redirects(redirects), (redirects, set()))
+
+    def test_chain(self):
+        resolved, cycles = resolve_redirects(
+            {'/a': '/b', '/b': '/c', '/c': '/news/c'})
+        self.assertEqual(resolved, {'/a': '/news/c', '/b': '/news/c',
+                                    '/c': '/news/c'})
+        self.assertEqual(cycles, set())
+
+    def test_cycles(self):
+        resolved, cycles = resolve_redirects(
+            {'/a': '/b', '/b': '/a', '/c': '/c', '/d': '/a', '/e': '/f'})
+        self.assertEqual(resolved, {'/e': '/f'})
+        self.assertEqual(cycles, set(['/a', '/b', '/c', '/d']))
+
+
+class StubStorage(object):
+    """The part of the redirection storage used by the section"""
+
+    def __init__(self, redirects=None):
+        self.redirects = dict(redirects or {})
+        self.added = []
+
+    def get(self, source, default=None):
+        return self.redirects.get(source, default)
+
+    def add(self, source, dest):
+        self.added.append((source, dest))
+        self.redirects[source] = dest
+
+
+def redirect(source, dest):
+    return {'_redirect_source': source, '_redirect_dest': dest}
+
+
+class TestRedirectsSection(unittest.TestCase):
+
+    layer = PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+
+    def section(self, items, storage, **options):
+        section = RedirectsSection(FakeTransmogrifier(self.portal),
+                                   'redirects', options, iter(items))
+        section.storage = storage
+        return section
+
+    def run_hooks(self):
+        for hook, args, kwargs in transaction.get().getBeforeCommitHooks():
+            hook(*args, **kwargs)
+
+    def test_items_yielded_once(self):
+        items = [{'_path': '/news'}, redirect('/a', '/news/a'),
+                 redirect('/a', '/news/a'), redirect('/b', '/news/b')]
+        section = self.section(items, StubStorage())
+        self.assertEqual(list(section), items)
+        self.assertEqual(section.storage.added,
+                         [('/a', '/news/a'), ('/b', '/news/b')])
+
+    def test_condition_false(self):
+        items = [redirect('/a', '/news/a'), redirect('/b', '/news/b')]
+        section = self.section(
+            items, StubStorage(),
+            condition="python:item['_redirect_source'] == '/b'")
+        self.assertEqual(list(section), items)
+        self.assertEqual(section.storage.added, [('/b', '/news/b')])
+
+    def test_duplicates_and_conflicts(self):
+        items = [redirect('/a', '/news/a'), redirect('/a', '/news/a'),
+                 redirect('/a', '/news/altra'), redirect('/b', '/a'),
+                 redirect('/c', '/c'), redirect('/d', '/news/d')]
+        section = self.section(items, StubStorage({'/d': '/news/d'}))
+        self.assertEqual(list(section), items)
+        # The first item wins and the chains are resolved
+        self.assertEqual(section.storage.added,
+                         [('/a', '/news/a'), ('/b', '/news/a')])
+        self.assertEqual(section.stats["added"], 2)
+        self.assertEqual(section.stats["existing"], 1)
+        self.assertEqual(section.stats["duplicates"], 1)
+        self.assertEqual(section.stats["conflicts"], 1)
+        self.assertEqual(section.stats["cycles"], 1)
+
+    def test_flush_before_commit(self):
+        items = [redirect('/a', '/news/a'), redirect('/b', '/news/b'),
+                 redirect('/c', '/news/c')]
+        section = self.section(items, StubStorage())
+        iterator = iter(section)
+        next(iterator)
+        next(iterator)
+        self.assertEqual(section.storage.added, [])
+        self.assertEqual(
+            len(list(transaction.get().getBeforeCommitHooks())), 1)
+
+        self.run_hooks()
+        self.assertEqual(section.storage.added,
+                         [('/a', '/news/a'), ('/b', '/news/b')])
+        # Nothing pending: running the hook again adds nothing
+        self.run_hooks()
+        self.assertEqual(len(section.storage.added), 2)
+
+        # The last redirect is added at the end of the pipeline
+        self.assertEqual(list(iterator), [items[2]])
+        self.assertEqual(section.storage.added[2:], [('/c', '/news/c')])
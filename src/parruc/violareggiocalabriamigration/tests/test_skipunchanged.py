@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import shutil
+import tempfile
+import unittest
+
+from zope.annotation.interfaces import IAnnotations
+
+from parruc.violareggiocalabriamigration.skipunchanged import \
+    SkipUnchangedSection
+from parruc.violareggiocalabriamigration.skipunchanged import STATS_KEY
+from parruc.violareggiocalabriamigration.source import Source
+from parruc.violareggiocalabriamigration.testing import \
+    FakeTransmogrifier
+from parruc.violareggiocalabriamigration.testing import \
+    PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING  # noqa
+from parruc.violareggiocalabriamigration.testing import \
+    write_export_item
+from plone import api
+
+
+class TestSkipUnchanged(unittest.TestCase):
+
+    layer = PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        with api.env.adopt_roles(['Manager']):
+            news = api.content.create(container=self.portal, type='Folder',
+                                      id='news')
+            api.content.create(container=news, type='News Item', id='old')
+
+    def run_section(self, items):
+        transmogrifier = FakeTransmogrifier(self.portal)
+        section = SkipUnchangedSection(transmogrifier, 'skipunchanged', {},
+                                       iter(items))
+        return list(section), IAnnotations(transmogrifier)[STATS_KEY]
+
+    def test_skip_unchanged(self):
+        items = [{'_path': u'/news'},
+                 {'_path': u'/news/old', '_hash': 'a'},
+                 {'_path': u'/news/new', '_hash': 'b'}]
+        kept, stats = self.run_section(items)
+        self.assertEqual(kept, items)
+        self.assertEqual(stats, {'new': 1, 'changed': 1, 'unchanged': 0})
+
+        # The new item was not really created
+        kept, stats = self.run_section(items)
+        self.assertEqual(kept, [items[0], items[2]])
+        self.assertEqual(stats, {'new': 1, 'changed': 0, 'unchanged': 1})
+
+    def test_changed_hash(self):
+        self.run_section([{'_path': u'/news/old', '_hash': 'a'}])
+        items = [{'_path': u'/news/old', '_hash': 'c'}]
+        kept, stats = self.run_section(items)
+        self.assertEqual(kept, items)
+        self.assertEqual(stats, {'new': 0, 'changed': 1, 'unchanged': 0})
+
+
+class CountingSource(Source):
+
+    def __init__(self, *args):
+        super(CountingSource, self).__init__(*args)
+        self.downloaded = []
+
+    def download(self, url):
+        self.downloaded.append(url)
+        return None
+
+
+class TestSourceSkipsImages(unittest.TestCase):
+
+    layer = PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        with api.env.adopt_roles(['Manager']):
+            news = api.content.create(container=self.portal, type='Folder',
+                                      id='news')
+            api.content.create(container=news, type='News Item', id='old')
+        self.directory = tempfile.mkdtemp()
+        self.write_item(0, 'old')
+        self.write_item(1, 'new')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_item(self, count, item_id, text=u""):
+        write_export_item(
+            self.directory, item_id, count, text=text,
+            images=[{"src": "http://localhost/%s.jpg" % item_id}])
+
+    def run_source(self):
+        transmogrifier = FakeTransmogrifier(self.portal)
+        source = CountingSource(transmogrifier, 'source',
+                                {'directory': self.directory, 'start': '0'},
+                                iter([]))
+        section = SkipUnchangedSection(transmogrifier, 'skipunchanged', {},
+                                       source)
+        return [item['_path'] for item in section], source.downloaded
+
+    def test_no_images_of_unchanged_items(self):
+        paths, downloaded = self.run_source()
+        self.assertEqual(paths, [u'/news', u'/news/old', u'/news/new'])
+        self.assertEqual(len(downloaded), 2)
+
+        paths, downloaded = self.run_source()
+        # The new item was not really created
+        self.assertEqual(paths, [u'/news', u'/news/new'])
+        self.assertEqual(downloaded, ['http://localhost/new.jpg'])
+
+    def test_changed_item_image(self):
+        self.run_source()
+        self.write_item(0, 'old', text=u"cambiato")
+        paths, downloaded = self.run_source()
+        self.assertIn(u'/news/old', paths)
+        self.assertIn('http://localhost/old.jpg', downloaded)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import shutil
+import tempfile
+import unittest
+
+from parruc.violareggiocalabriamigration.commit import CommitSection
+from parruc.violareggiocalabriamigration.commit import get_cursor
+from parruc.violareggiocalabriamigration.commit import set_cursor
+from parruc.violareggiocalabriamigration.skipunchanged import \
+    SkipUnchangedSection
+from parruc.violareggiocalabriamigration.source import Source
+from parruc.violareggiocalabriamigration.testing import \
+    FakeTransmogrifier
+from parruc.violareggiocalabriamigration.testing import \
+    PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING  # noqa
+from parruc.violareggiocalabriamigration.testing import \
+    write_export_item
+from plone import api
+
+
+class TestSourceCursor(unittest.TestCase):
+
+    layer = PARRUC_VIOLAREGGIOCALABRIAMIGRATION_INTEGRATION_TESTING
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        self.directory = tempfile.mkdtemp()
+        with api.env.adopt_roles(['Manager']):
+            self.news = api.content.create(container=self.portal,
+                                           type='Folder', id='news')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_import(self, **options):
+        """Paths that reach the end of the pipeline"""
+        options['directory'] = self.directory
+        transmogrifier = FakeTransmogrifier(self.portal)
+        source = Source(transmogrifier, 'source', options, iter([]))
+        skip = SkipUnchangedSection(transmogrifier, 'skipunchanged', {},
+                                    source)
+        commit = CommitSection(transmogrifier, 'commit',
+                               {'savepoint': 'true'}, skip)
+        return [item['_path'] for item in commit]
+
+    def test_cursor_past_unchanged_items(self):
+        for count, name in enumerate(['uno', 'due', 'tre', 'quattro']):
+            write_export_item(self.directory, name, count)
+            with api.env.adopt_roles(['Manager']):
+                api.content.create(container=self.news, type='News Item',
+                                   id=name)
+        self.run_import(start='0')
+        self.assertEqual(get_cursor(self.portal), 0)
+
+        # A window of unchanged items only
+        self.assertEqual(self.run_import(batch='2'), [u'/news'])
+        self.assertEqual(get_cursor(self.portal), 2)
+        self.assertEqual(self.run_import(batch='1'), [u'/news'])
+        self.assertEqual(get_cursor(self.portal), 3)
+        self.assertEqual(self.run_import(batch='2'), [u'/news'])
+        self.assertEqual(get_cursor(self.portal), 0)
+
+    def test_items_in_export_order(self):
+        write_export_item(self.directory, 'b', 0)
+        write_export_item(self.directory, 'c', 1)
+        write_export_item(self.directory, 'd', 2)
+        self.assertEqual(self.run_import(batch='2'),
+                         [u'/news', u'/news/b', u'/news/c'])
+        self.assertEqual(get_cursor(self.portal), 2)
+
+        # An incremental export added an item that sorts first by name
+        write_export_item(self.directory, 'a', 3)
+        self.assertEqual(self.run_import(),
+                         [u'/news', u'/news/d', u'/news/a'])
+        self.assertEqual(get_cursor(self.portal), 0)
+
+    def test_start(self):
+        for count, name in enumerate(['uno', 'due', 'tre']):
+            write_export_item(self.directory, name, count)
+        set_cursor(self.portal, 2)
+        self.assertEqual(self.run_import(start='1', batch='1'),
+                         [u'/news', u'/news/due'])
+        self.assertEqual(get_cursor(self.portal), 2)